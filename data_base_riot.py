@@ -5,47 +5,49 @@ Collecte N matchs LoL en CSV, SANS restriction de rang.
 - Seed via ladder high tiers (MASTER -> GRANDMASTER -> CHALLENGER), shard en minuscules (euw1/na1/…)
 - Pas d'usage de summoner.by_name (compat anciennes versions)
 - Option: fournir des seeds manuellement (--seed-ids ou --seed-puuids)
+- Option: pool de clés (--api-keys-file), budget par clé, voir riot_keys.py
 
 Sorties :
   - participants.csv : matchId, teamId, teamWin, winnerTeamId, role, championName,
-                       kills, deaths, assists, kda_ratio, summoner1Id, summoner2Id, puuid
+                       kills, deaths, assists, kda_ratio, summoner1Id, summoner2Id, puuid, patch
   - matches.csv      : matchId, winnerTeamId
+  (ou, avec --sink sqlite, les tables participants/matches de matches.db)
 """
 
 from __future__ import annotations
-import argparse, os, time, random, collections
+import argparse, os, time, random, collections, sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Dict, List, Set, Deque, Tuple
+from typing import Any, Callable, Dict, List, Set, Deque, Tuple
 import pandas as pd
 
 # --------- Riot deps ----------
 try:
-    from riotwatcher import LolWatcher, RiotWatcher, ApiError
+    from riotwatcher import LolWatcher, ApiError
 except Exception as e:
     raise SystemExit("Installe: pip install riotwatcher pandas\n" + str(e))
 
+from riot_retry import RetryScheduler, DeferredRetryQueue, TransientError, stoppable_sleep
+from riot_keys import KeyPool, DEV_KEY_LIMITS, load_keys, riot_base_url
+import profiling
+from lol_matchups_test import patch_of   # même découpage de patch à la collecte et à l'analyse
+
 # --------- Rôles ----------
 ROLE_MAP = {"TOP":"top","JUNGLE":"jungle","MIDDLE":"mid","BOTTOM":"bot","UTILITY":"sup"}
 
 # --------- Rate limit ----------
-SLEEP_PER_CALL = 1.3      # ≈92 req / 2 min (clé dev ~100 / 2min)
-BACKOFF_429    = 3.0
-
-def sleep_brief(): time.sleep(SLEEP_PER_CALL)
+# Pas de pause fixe entre appels : chaque clé du KeyPool a son budget (fenêtres glissantes),
+# et acquire() attend qu'une clé ait du budget. Les appels en masse (seeds, matchs) passent par len(pool) workers.
 
-def safe_call(fn, *args, **kwargs):
-    while True:
-        try:
-            res = fn(*args, **kwargs)
-            sleep_brief()
-            return res
-        except ApiError as e:
-            code = getattr(getattr(e, "response", None), "status_code", None)
-            if code == 429:
-                time.sleep(BACKOFF_429); continue
-            if code in (401, 403):
-                raise SystemExit("Clé API invalide/expirée (401/403). Mets RIOT_API_KEY à jour.")
-            raise
+def safe_call(retry: RetryScheduler, fn, *args, **kwargs):
+    """
+    retry : backoff par classe d'erreur + circuit breaker par endpoint (voir riot_retry.py),
+    un par collecte (stats et breakers ne fuient pas d'un run à l'autre).
+    ApiError (404…) : erreur définitive ; TransientError : à retenter plus tard ;
+    SystemExit : plus aucune clé valide dans le pool.
+    """
+    return retry.call(fn, *args, **kwargs)
 
 # --------- Extraction ----------
 def extract_winner_team_id(info: Dict) -> int | None:
@@ -55,6 +57,7 @@ def extract_winner_team_id(info: Dict) -> int | None:
 def iter_participant_rows(match: Dict) -> List[Dict[str, Any]]:
     meta = match.get("metadata", {}); info = match.get("info", {})
     match_id = meta.get("matchId"); winner_team = extract_winner_team_id(info)
+    patch = patch_of(info.get("gameVersion"))
     out=[]
     for p in info.get("participants", []):
         role = ROLE_MAP.get((p.get("teamPosition") or "").upper())
@@ -74,17 +77,31 @@ def iter_participant_rows(match: Dict) -> List[Dict[str, Any]]:
             "summoner1Id": p.get("summoner1Id"),
             "summoner2Id": p.get("summoner2Id"),
             "puuid": p.get("puuid"),
+            "patch": patch,
         })
     return out
 
 def rows_schema() -> List[str]:
     return ["matchId","teamId","teamWin","winnerTeamId","role","championName",
-            "kills","deaths","assists","kda_ratio","summoner1Id","summoner2Id","puuid"]
+            "kills","deaths","assists","kda_ratio","summoner1Id","summoner2Id","puuid","patch"]
 
 # --------- IO ----------
-def save_append_csv(path: Path, rows: List[Dict[str, Any]], header: bool) -> None:
+MATCH_COLS = ["matchId","winnerTeamId"]
+
+def csv_columns(path: Path, schema: List[str], legacy: List[str]) -> Tuple[List[str], bool]:
+    """
+    (colonnes, en-tête présent ?) d'un CSV existant. Le collecteur d'origine écrivait ses fichiers
+    SANS ligne d'en-tête, avec les colonnes `legacy` : on les reconnaît au nombre de colonnes.
+    """
+    first = pd.read_csv(path, header=None, nrows=1, dtype=str).iloc[0].tolist()
+    if first in (schema, legacy): return first, True
+    if len(first) == len(legacy) and first[0] != legacy[0]: return legacy, False
+    raise SystemExit(f"{path}: première ligne inattendue {first}.\n"
+                     f"Déplace ce fichier ou migre-le vers les colonnes {schema}.")
+
+def save_append_csv(path: Path, rows: List[Dict[str, Any]], header: bool, columns: List[str] | None = None) -> None:
     if not rows: return
-    df=pd.DataFrame(rows, columns=rows_schema())
+    df=pd.DataFrame(rows, columns=columns or rows_schema())
     path.parent.mkdir(parents=True, exist_ok=True)
     df.to_csv(path, mode=("w" if header else "a"), index=False, header=header)
 
@@ -94,8 +111,102 @@ def save_matches_csv(path: Path, match_rows: List[Tuple[str,int|None]], header:
     path.parent.mkdir(parents=True, exist_ok=True)
     df.to_csv(path, mode=("w" if header else "a"), index=False, header=header)
 
+# --------- Sinks ----------
+class CsvSink:
+    """
+    participants.csv + matches.csv en append. En-têtes écrits seulement pour un fichier neuf :
+    une collecte relancée complète les fichiers existants et saute les matchs déjà présents.
+    """
+    def __init__(self, outdir: Path):
+        self.part_csv = outdir / "participants.csv"
+        self.match_csv = outdir / "matches.csv"
+        if not self.part_csv.exists() or self.part_csv.stat().st_size == 0:
+            pd.DataFrame(columns=rows_schema()).to_csv(self.part_csv, index=False)
+        if not self.match_csv.exists() or self.match_csv.stat().st_size == 0:
+            pd.DataFrame(columns=MATCH_COLS).to_csv(self.match_csv, index=False)
+        # fichiers antérieurs à la colonne patch (avec ou sans en-tête) : on garde leur format
+        self.part_cols, _ = csv_columns(self.part_csv, rows_schema(), rows_schema()[:-1])
+        _, self.match_header = csv_columns(self.match_csv, MATCH_COLS, MATCH_COLS)
+
+    def known_match_ids(self) -> Set[str]:
+        kw = {} if self.match_header else {"header": None, "names": MATCH_COLS}
+        return set(pd.read_csv(self.match_csv, usecols=["matchId"], dtype=str, **kw)["matchId"].dropna())
+
+    def write(self, rows: List[Dict[str, Any]], match_rows: List[Tuple[str,int|None]]) -> None:
+        save_append_csv(self.part_csv, rows, header=False, columns=self.part_cols)
+        save_matches_csv(self.match_csv, match_rows, header=False)
+
+    def close(self) -> None:
+        print(f"participants.csv -> {self.part_csv.resolve()}")
+        print(f"matches.csv      -> {self.match_csv.resolve()}")
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS participants (
+    matchId TEXT NOT NULL, teamId INTEGER, teamWin INTEGER, winnerTeamId INTEGER,
+    role TEXT, championName TEXT, kills INTEGER, deaths INTEGER, assists INTEGER,
+    kda_ratio REAL, summoner1Id INTEGER, summoner2Id INTEGER, puuid TEXT NOT NULL, patch TEXT,
+    PRIMARY KEY (matchId, puuid)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS matches (
+    matchId TEXT NOT NULL PRIMARY KEY, winnerTeamId INTEGER
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_participants_role_champion ON participants (role, championName);
+"""
+# Pas d'index séparé sur matchId : la clé primaire (matchId, puuid) d'une table
+# WITHOUT ROWID est déjà un B-tree trié par matchId (les lignes d'un match sont contiguës).
+
+class SqliteSink:
+    """
+    matches.db indexé. Chaque flush = une transaction + executemany préparé.
+    Les doublons (matchId, puuid) sont rejetés à l'écriture (INSERT OR IGNORE),
+    et les matchs déjà en base sont sautés à la reprise d'une collecte.
+    Un match dont un participant n'a pas de puuid (clé primaire) est rejeté en entier et signalé,
+    plutôt que stocké avec moins de 10 lignes.
+    """
+    def __init__(self, outdir: Path):
+        self.path = outdir / "matches.db"
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SQLITE_SCHEMA)
+        # bases créées avant la colonne patch
+        present = {r[1] for r in self.conn.execute("PRAGMA table_info(participants)")}
+        if "patch" not in present:
+            self.conn.execute("ALTER TABLE participants ADD COLUMN patch TEXT")
+        cols = rows_schema()
+        self.insert_participant = (f"INSERT OR IGNORE INTO participants ({','.join(cols)}) "
+                                   f"VALUES ({','.join(':'+c for c in cols)})")
+        self.rejected: List[str] = []
+
+    def known_match_ids(self) -> Set[str]:
+        return {r[0] for r in self.conn.execute("SELECT matchId FROM matches")}
+
+    def write(self, rows: List[Dict[str, Any]], match_rows: List[Tuple[str,int|None]]) -> None:
+        bad = {r["matchId"] for r in rows if not r.get("puuid")}
+        if bad:
+            self.rejected += sorted(bad)
+            print(f"[SQLITE] {len(bad)} match(s) rejeté(s) (participant sans puuid): {', '.join(sorted(bad))}")
+            rows = [r for r in rows if r["matchId"] not in bad]
+            match_rows = [m for m in match_rows if m[0] not in bad]
+        if not rows and not match_rows: return
+        with self.conn:  # une seule transaction par batch
+            self.conn.executemany(self.insert_participant, rows)
+            self.conn.executemany("INSERT OR IGNORE INTO matches (matchId, winnerTeamId) VALUES (?, ?)", match_rows)
+
+    def close(self) -> None:
+        self.conn.execute("PRAGMA optimize")
+        self.conn.close()
+        if self.rejected:
+            print(f"[SQLITE] Matchs rejetés (puuid manquant): {len(self.rejected)}")
+        print(f"matches.db       -> {self.path.resolve()}")
+
+SINKS = {"csv": CsvSink, "sqlite": SqliteSink}
+
 # --------- Seed (sans by_name) ----------
-def league_entries_pages(lol, platform_lc: str, queue_str: str, tier_en: str, div: str, max_pages: int = 10) -> List[dict]:
+# Les TransientError du seeding (retries épuisés) sont notées dans `deferred` comme perdues
+# (clés ("ladder", ...) / ("summoner", id)) : elles apparaissent dans le bilan et failed_ids.txt.
+def league_entries_pages(retry: RetryScheduler, deferred: DeferredRetryQueue, lol, platform_lc: str, queue_str: str,
+                         tier_en: str, div: str, max_pages: int = 10) -> List[dict]:
     """
     Compat signature: riotwatcher a varié dans l'ordre des params.
     On essaie d'abord (platform, queue, tier, division, page), puis (platform, tier, division, queue, page).
@@ -103,23 +214,30 @@ def league_entries_pages(lol, platform_lc: str, queue_str: str, tier_en: str, di
     """
     all_entries=[]
     for pg in range(1, max_pages+1):
-        entries=[]
+        entries=[]; lost = None
         try:
-            entries = safe_call(lol.league.entries, platform_lc, queue_str, tier_en, div, page=pg)
+            entries = safe_call(retry, lol.league.entries, platform_lc, queue_str, tier_en, div, page=pg)
+        except TransientError as e:
+            lost = e
         except ApiError:
             entries=[]
         if not entries:
             try:
-                entries = safe_call(lol.league.entries, platform_lc, tier_en, div, queue_str, page=pg)
+                entries = safe_call(retry, lol.league.entries, platform_lc, tier_en, div, queue_str, page=pg)
+            except TransientError as e:
+                lost = e
             except ApiError:
                 entries=[]
+        if not entries and lost is not None:
+            deferred.fail(("ladder", f"{tier_en} {div} p{pg}"), lost)
         if not entries:
             # page vide -> on continue (les pages sup peuvent être vides, selon l’implémentation)
             continue
         all_entries.extend(entries)
     return all_entries
 
-def seed_from_ladder_hightiers(lol: LolWatcher, platform_lc: str, queue_str: str) -> List[str]:
+def seed_from_ladder_hightiers(retry: RetryScheduler, deferred: DeferredRetryQueue, lol: LolWatcher,
+                               platform_lc: str, queue_str: str) -> List[str]:
     """
     Récupère des summonerId via high tiers (MASTER -> GM -> CHALL).
     Utilise EXCLUSIVEMENT le shard en minuscules (euw1).
@@ -128,45 +246,58 @@ def seed_from_ladder_hightiers(lol: LolWatcher, platform_lc: str, queue_str: str
 
     # MASTER
     try:
-        data = safe_call(lol.league.masters_by_queue, platform_lc, queue_str)
+        data = safe_call(retry, lol.league.masters_by_queue, platform_lc, queue_str)
         ids += [e.get("summonerId") for e in (data.get("entries") or []) if e.get("summonerId")]
+    except TransientError as e:
+        deferred.fail(("ladder", "MASTER"), e)
     except ApiError:
         pass
 
     # GRANDMASTER
     if not ids:
         try:
-            data = safe_call(lol.league.grandmaster_by_queue, platform_lc, queue_str)
+            data = safe_call(retry, lol.league.grandmaster_by_queue, platform_lc, queue_str)
             ids += [e.get("summonerId") for e in (data.get("entries") or []) if e.get("summonerId")]
+        except TransientError as e:
+            deferred.fail(("ladder", "GRANDMASTER"), e)
         except ApiError:
             pass
 
     # CHALLENGER
     if not ids:
         try:
-            data = safe_call(lol.league.challenger_by_queue, platform_lc, queue_str)
+            data = safe_call(retry, lol.league.challenger_by_queue, platform_lc, queue_str)
             ids += [e.get("summonerId") for e in (data.get("entries") or []) if e.get("summonerId")]
+        except TransientError as e:
+            deferred.fail(("ladder", "CHALLENGER"), e)
         except ApiError:
             pass
 
     # Elargissement DIAMOND si toujours rien (certaines configs renvoient 0)
     if not ids:
         for div in ["I","II","III","IV"]:
-            entries = league_entries_pages(lol, platform_lc, queue_str, "DIAMOND", div, max_pages=10)
+            entries = league_entries_pages(retry, deferred, lol, platform_lc, queue_str, "DIAMOND", div, max_pages=10)
             ids += [e.get("summonerId") for e in entries if e.get("summonerId")]
             if ids: break
 
     # dédup
     return list({x for x in ids if x})
 
-def summoner_ids_to_puuids(lol: LolWatcher, platform_lc: str, summ_ids: List[str]) -> List[str]:
-    puuids=[]
-    for sid in summ_ids:
+def summoner_ids_to_puuids(retry: RetryScheduler, deferred: DeferredRetryQueue, lol: LolWatcher,
+                           platform_lc: str, summ_ids: List[str],
+                           workers: ThreadPoolExecutor | None = None) -> List[str]:
+    def lookup(sid: str):
         try:
-            s = safe_call(lol.summoner.by_id, platform_lc, sid)   # <-- by_id existe chez toi
-            if s.get("puuid"): puuids.append(s["puuid"])
-        except ApiError:
-            pass
+            return sid, safe_call(retry, lol.summoner.by_id, platform_lc, sid), None   # <-- by_id existe chez toi
+        except (ApiError, TransientError) as e:
+            return sid, None, e
+
+    puuids=[]
+    for sid, s, err in (workers.map(lookup, summ_ids) if workers else map(lookup, summ_ids)):
+        if isinstance(err, TransientError):
+            deferred.fail(("summoner", sid), err)
+        elif s and s.get("puuid"):
+            puuids.append(s["puuid"])
     return list({p for p in puuids if p})
 
 # --------- Collecte ----------
@@ -181,90 +312,136 @@ def collect_dataset(
     max_seed_players: int = 300,
     seed_ids: List[str] | None = None,     # summonerId seeds (optionnel)
     seed_puuids: List[str] | None = None,  # puuid seeds (optionnel)
+    on_match: Callable[[int, List[Dict[str, Any]]], None] | None = None,  # appelé après chaque match (processed, lignes)
+    should_stop: Callable[[], bool] | None = None,                        # arrêt coopératif (ex: bouton Annuler)
+    stop_event: threading.Event | None = None,                            # idem, réveille aussi les attentes (budget, backoff)
+    sink: str = "csv",                                                   # csv | sqlite
+    base_url: str | None = None,                                         # serveur local (riot_mock_server.py)
+    api_keys: List[str] | None = None,                                   # pool de clés (même application)
+    key_limits: str = DEV_KEY_LIMITS,                                    # budget par clé 'n:secondes,...'
 ):
-    rw = RiotWatcher(api_key)
-    lol = LolWatcher(api_key)
-
-    # Compat éventuelle (certaines vieilles versions)
-    if not hasattr(lol.league, "masters_by_queue") and hasattr(lol.league, "master_by_queue"):
-        lol.league.masters_by_queue = lol.league.master_by_queue
-
-    platform_lc = platform.lower().strip()   # CRUCIAL: rester en minuscules (euw1)
-    QUEUE_STR = "RANKED_SOLO_5x5" if (queue_id == 420 or queue_id is None) else "RANKED_FLEX_SR"
-
-    outdir.mkdir(parents=True, exist_ok=True)
-    part_csv = outdir / "participants.csv"
-    match_csv = outdir / "matches.csv"
-    save_append_csv(part_csv, [], header=True)
-    save_matches_csv(match_csv, [], header=True)
-
-    # 1) Seeds
-    seeds_puuids: List[str] = []
-
-    # a) PUUIDs fournis ?
-    if seed_puuids:
-        seeds_puuids = list({p for p in seed_puuids if p})
-
-    # b) summonerIds fournis ?
-    elif seed_ids:
-        # on convertit ces IDs en PUUIDs
-        seeds_puuids = summoner_ids_to_puuids(lol, platform_lc, list({x for x in seed_ids if x}))
-
-    # c) sinon, ladder high tiers (MASTER -> GM -> CHALL -> DIAMOND pages)
-    else:
-        summ_ids = seed_from_ladder_hightiers(lol, platform_lc, QUEUE_STR)
-        if not summ_ids:
-            raise SystemExit("Impossible de récupérer des seeds via le ladder (essaie --seed-ids ou --seed-puuids).")
-        if max_seed_players and len(summ_ids) > max_seed_players:
-            random.shuffle(summ_ids); summ_ids = summ_ids[:max_seed_players]
-        seeds_puuids = summoner_ids_to_puuids(lol, platform_lc, summ_ids)
-
-    if not seeds_puuids:
-        raise SystemExit("Aucun PUUID seed disponible (essaie --seed-ids ou --seed-puuids).")
-
-    # 2) Parcours (snowball)
-    puuid_queue: Deque[str] = collections.deque(seeds_puuids)
-    seen_puuids: Set[str] = set(seeds_puuids)
-    seen_matches: Set[str] = set()
-
-    processed = 0
-    batch_rows: List[Dict[str, Any]] = []
-    batch_match_rows: List[Tuple[str, int | None]] = []
-
-    print(f"[RUN] cible={target_matches} matchs, queue_id={queue_id}, seeds={len(seeds_puuids)}")
-
-    while processed < target_matches and puuid_queue:
-        puuid = puuid_queue.popleft()
+    stop = stop_event or threading.Event()
+
+    def stopping() -> bool:
+        return stop.is_set() or bool(should_stop and should_stop())
+
+    pool = KeyPool(api_keys or [api_key], limits=key_limits, sleep=stoppable_sleep(stop))
+    rw = pool.riot()
+    lol = pool.lol()
+    # len(pool) workers pour les appels en masse (summonerId -> puuid, matchs) : chacun prend la clé
+    # la moins chargée ; le traitement (on_match, sink, snowball) reste sur ce thread.
+    # Le bloc with arrête les workers sur tous les chemins (SystemExit du pool compris) ;
+    # riot_base_url après les watchers, qui réinitialisent l'URL.
+    n_workers = len(pool)
+    with riot_base_url(base_url), \
+         ThreadPoolExecutor(max_workers=n_workers, thread_name_prefix="riot-fetch") as workers:
+
+        # Compat éventuelle (certaines vieilles versions)
+        if not hasattr(lol.league, "masters_by_queue") and hasattr(lol.league, "master_by_queue"):
+            lol.league.masters_by_queue = lol.league.master_by_queue
+
+        platform_lc = platform.lower().strip()   # CRUCIAL: rester en minuscules (euw1)
+        QUEUE_STR = "RANKED_SOLO_5x5" if (queue_id == 420 or queue_id is None) else "RANKED_FLEX_SR"
+
+        outdir.mkdir(parents=True, exist_ok=True)
+        out = SINKS[sink](outdir)
+        retry = RetryScheduler(sleep=stoppable_sleep(stop))
+        deferred = DeferredRetryQueue()   # clés ("puuid", x) / ("match", x) en attente de retry, + pertes du seeding
+
+        # 1) Seeds
+        with profiling.stage("seed"):
+            seeds_puuids: List[str] = []
+
+            # a) PUUIDs fournis ?
+            if seed_puuids:
+                seeds_puuids = list({p for p in seed_puuids if p})
+
+            # b) summonerIds fournis ?
+            elif seed_ids:
+                # on convertit ces IDs en PUUIDs
+                seeds_puuids = summoner_ids_to_puuids(retry, deferred, lol, platform_lc, list({x for x in seed_ids if x}), workers)
+
+            # c) sinon, ladder high tiers (MASTER -> GM -> CHALL -> DIAMOND pages)
+            else:
+                summ_ids = seed_from_ladder_hightiers(retry, deferred, lol, platform_lc, QUEUE_STR)
+                if not summ_ids and not stopping():
+                    raise SystemExit("Impossible de récupérer des seeds via le ladder (essaie --seed-ids ou --seed-puuids).")
+                if max_seed_players and len(summ_ids) > max_seed_players:
+                    random.shuffle(summ_ids); summ_ids = summ_ids[:max_seed_players]
+                seeds_puuids = summoner_ids_to_puuids(retry, deferred, lol, platform_lc, summ_ids, workers)
+
+        if stopping():
+            print("[STOP] Arrêt demandé pendant le seeding.")
+            out.close(); return
+        if not seeds_puuids:
+            raise SystemExit("Aucun PUUID seed disponible (essaie --seed-ids ou --seed-puuids).")
+
+        # 2) Parcours (snowball)
+        puuid_queue: Deque[str] = collections.deque(seeds_puuids)
+        seen_puuids: Set[str] = set(seeds_puuids)
+        seen_matches: Set[str] = out.known_match_ids()
+
+        processed = 0
+        batch_rows: List[Dict[str, Any]] = []
+        batch_match_rows: List[Tuple[str, int | None]] = []
 
         # matchlist par puuid (sans filtre de rang, seulement queue si fournie)
         kw={}
         if queue_id:
             kw["queue"]=queue_id
             kw["type"]="ranked"
-        try:
-            mlist = safe_call(lol.match.matchlist_by_puuid, region, puuid, count=matchlist_count, **kw)
-        except ApiError:
-            continue
-        if not mlist: continue
 
-        for mid in mlist:
-            if processed >= target_matches: break
-            if mid in seen_matches: continue
+        def fetch_matchlist(puuid: str) -> List[str]:
+            key = ("puuid", puuid)
             try:
-                match = safe_call(lol.match.by_id, region, mid)
-            except ApiError:
-                continue
+                with profiling.stage("matchlist"):
+                    mlist = safe_call(retry, lol.match.matchlist_by_puuid, region, puuid, count=matchlist_count, **kw)
+            except TransientError as e:
+                deferred.defer(key, e); return []
+            except ApiError as e:
+                deferred.fail(key, e); return []
+            deferred.done(key)
+            return mlist or []
+
+        def download(mid: str) -> Tuple[str, Dict | None, Exception | None]:
+            try:
+                return mid, safe_call(retry, lol.match.by_id, region, mid), None
+            except (TransientError, ApiError) as e:
+                return mid, None, e
+
+        def fetch_matches(mids: List[str]) -> None:
+            i = 0
+            while i < len(mids) and not done():
+                # pas plus de matchs en vol que ce qu'il reste à collecter
+                n = min(2 * n_workers, max(1, target_matches - processed))
+                chunk = mids[i:i + n]; i += n
+                with profiling.stage("fetch"):
+                    results = list(workers.map(download, chunk))
+                for mid, match, err in results:
+                    handle_match(mid, match, err)
+
+        def handle_match(mid: str, match: Dict | None, err: Exception | None) -> None:
+            nonlocal processed
+            key = ("match", mid)
+            if isinstance(err, TransientError):
+                deferred.defer(key, err); return
+            if err is not None:
+                deferred.fail(key, err); return
+            deferred.done(key)
+            seen_matches.add(mid)
+
             info = match.get("info", {})
-            if not info or not info.get("participants"): continue
+            if not info or not info.get("participants"): return
 
-            p_rows = iter_participant_rows(match)
-            if not p_rows: continue
+            with profiling.stage("extract"):
+                p_rows = iter_participant_rows(match)
+            if not p_rows: return
 
             winner_team = extract_winner_team_id(info)
             batch_rows.extend(p_rows)
             batch_match_rows.append((mid, winner_team))
-            seen_matches.add(mid)
             processed += 1
+            if on_match: on_match(processed, p_rows)
 
             # snowball: on ajoute tous les puuids vus
             for pr in p_rows:
@@ -275,25 +452,62 @@ def collect_dataset(
 
             # flush périodique
             if len(batch_rows) >= 500:
-                save_append_csv(part_csv, batch_rows, header=False)
-                save_matches_csv(match_csv, batch_match_rows, header=False)
+                with profiling.stage("write"):
+                    out.write(batch_rows, batch_match_rows)
                 print(f"[SAVE] {processed}/{target_matches} matchs")
                 batch_rows.clear(); batch_match_rows.clear()
 
-    # flush final
-    if batch_rows:
-        save_append_csv(part_csv, batch_rows, header=False)
-        save_matches_csv(match_csv, batch_match_rows, header=False)
-        print(f"[SAVE] Flush final : +{len(batch_match_rows)} matchs")
-
-    print(f"[DONE] Matchs collectés: {processed}.")
-    print(f"participants.csv -> {part_csv.resolve()}")
-    print(f"matches.csv      -> {match_csv.resolve()}")
+        def done() -> bool:
+            return processed >= target_matches or stopping()
+
+        def crawl_puuid(puuid: str) -> None:
+            mids = [m for m in dict.fromkeys(fetch_matchlist(puuid))
+                    if m not in seen_matches and ("match", m) not in deferred]
+            fetch_matches(mids)
+
+        print(f"[RUN] cible={target_matches} matchs, queue_id={queue_id}, seeds={len(seeds_puuids)}")
+
+        while not done() and (puuid_queue or deferred):
+            # a) retries arrivés à échéance (sans bloquer le travail neuf)
+            ready = deferred.pop_ready()
+            fetch_matches([x for kind, x in ready if kind == "match"])
+            for kind, x in ready:
+                if done(): break
+                if kind == "puuid": crawl_puuid(x)
+
+            # b) travail neuf ; s'il n'y en a plus, on attend le prochain retry
+            if puuid_queue:
+                crawl_puuid(puuid_queue.popleft())
+            elif not done():
+                stop.wait(min(deferred.next_ready_in() or 0.0, 5.0))
+
+        if stopping():
+            print("[STOP] Arrêt demandé, flush des données en cours.")
+
+        # flush final
+        if batch_rows:
+            with profiling.stage("write"):
+                out.write(batch_rows, batch_match_rows)
+            print(f"[SAVE] Flush final : +{len(batch_match_rows)} matchs")
+
+        print(f"[DONE] Matchs collectés: {processed}.")
+        print(f"[KEYS] {pool.summary()}")
+        print(f"[RETRY] {deferred.summary()} | appels={retry.stats['calls']}, retries={retry.stats['retries']}, "
+              f"429={retry.stats['rate_limited']}, 5xx={retry.stats['server']}, réseau={retry.stats['network']}")
+        if deferred.failed:
+            failed_path = outdir / "failed_ids.txt"
+            with open(failed_path, "w", encoding="utf-8") as f:
+                for (kind, x), reason in deferred.failed.items():
+                    f.write(f"{kind}\t{x}\t{reason}\n")
+            print(f"IDs perdus        -> {failed_path.resolve()}")
+        out.close()
 
 # --------- CLI ----------
 def main():
     ap = argparse.ArgumentParser(description="Collecte N matchs (sans restriction de rang)")
     ap.add_argument("--api-key", type=str, help="Clé Riot (sinon utilise RIOT_API_KEY)")
+    ap.add_argument("--api-keys-file", type=str, help="Pool de clés, une par ligne (même application : PUUID chiffrés par app)")
+    ap.add_argument("--key-limits", type=str, default=DEV_KEY_LIMITS, help="Budget par clé 'n:secondes,...' (clé dev: 20:1,100:120)")
     ap.add_argument("--region", type=str, default="europe", help="Routing match-v5 (europe/americas/asia/sea)")
     ap.add_argument("--platform", type=str, default="euw1", help="Shard league/summoner (euw1/na1/kr/...)")
     ap.add_argument("--target", type=int, default=1000, help="Nombre de matchs à collecter")
@@ -301,6 +515,10 @@ def main():
     ap.add_argument("--matchlist-count", type=int, default=100, help="Nb d'IDs par puuid (max 100)")
     ap.add_argument("--outdir", type=str, default="data_db", help="Dossier de sortie")
     ap.add_argument("--max-seed-players", type=int, default=300, help="Limite de seeds initiaux")
+    ap.add_argument("--sink", choices=sorted(SINKS), default="csv", help="Sortie: CSV (append) ou SQLite indexé (matches.db)")
+    ap.add_argument("--base-url", type=str, help="Serveur Riot alternatif (ex: riot_mock_server.py), sinon RIOT_BASE_URL")
+    ap.add_argument("--profile", action="store_true", help="Temps + pic mémoire par étape: seed, matchlist, fetch, extract, write")
+    ap.add_argument("--profile-out", type=str, metavar="DIR", help="Active --profile et écrit profile.pstats + stacks.collapsed (flamegraph)")
 
     # Seeds manuels (optionnels)
     ap.add_argument("--seed-ids", type=str, help="summonerId seeds, séparés par des virgules")
@@ -312,8 +530,9 @@ def main():
 
     if args.api_key: os.environ["RIOT_API_KEY"]=args.api_key
     api_key = os.getenv("RIOT_API_KEY")
-    if not api_key:
-        raise SystemExit("RIOT_API_KEY absente. Fournis --api-key RGAPI-XXXX ou exporte la variable.")
+    api_keys = load_keys(Path(args.api_keys_file)) if args.api_keys_file else None
+    if not api_key and not api_keys:
+        raise SystemExit("RIOT_API_KEY absente. Fournis --api-key RGAPI-XXXX, --api-keys-file ou exporte la variable.")
 
     region   = args.region.lower().strip()
     platform = args.platform.lower().strip()
@@ -332,18 +551,26 @@ def main():
         with open(args.seed_puuids_file, "r", encoding="utf-8") as f:
             seed_puuids += [ln.strip() for ln in f if ln.strip()]
 
-    collect_dataset(
-        api_key=api_key,
-        region=region,
-        platform=platform,
-        target_matches=args.target,
-        queue_id=(args.queue if args.queue != 0 else None),
-        outdir=Path(args.outdir),
-        matchlist_count=max(1, min(100, args.matchlist_count)),
-        max_seed_players=max(50, args.max_seed_players),
-        seed_ids=(seed_ids or None),
-        seed_puuids=(seed_puuids or None),
-    )
+    if args.profile or args.profile_out: profiling.enable(args.profile_out)
+    try:
+        collect_dataset(
+            api_key=api_key,
+            region=region,
+            platform=platform,
+            target_matches=args.target,
+            queue_id=(args.queue if args.queue != 0 else None),
+            outdir=Path(args.outdir),
+            matchlist_count=max(1, min(100, args.matchlist_count)),
+            max_seed_players=max(50, args.max_seed_players),
+            seed_ids=(seed_ids or None),
+            seed_puuids=(seed_puuids or None),
+            sink=args.sink,
+            base_url=args.base_url,
+            api_keys=api_keys,
+            key_limits=args.key_limits,
+        )
+    finally:
+        profiling.finish()
 
 if __name__ == "__main__":
     main()
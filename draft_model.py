@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Probabilité de victoire d'une draft complète (10 champions), entraînée en continu sur la collecte.
+
+- features one-hot creuses (scipy.sparse CSR) : (côté, rôle, champion) -> 10 valeurs non nulles par match
+  sur 2 x 5 x CAPACITY colonnes ; vocabulaire de champions à capacité fixe, pour que l'espace des
+  features ne change pas d'un entraînement à l'autre
+- régression logistique par SGD mini-batch (SGDClassifier(loss="log_loss").partial_fit), un morceau à la fois
+- ré-entraînement incrémental : les matchIds déjà vus (hachés) sont ignorés, on peut relancer --train
+  sur le même participants.csv après chaque collecte
+- predict / rank_candidates : des milliers de drafts évaluées en un seul appel
+
+USAGE EXEMPLES
+--------------
+# Entraînement (ou mise à jour) depuis la sortie de data_base_riot.py ou lol_matchups_test.py
+python draft_model.py --train data_db/participants.csv
+python draft_model.py --train data/matches_raw.jsonl
+
+# Probabilité de victoire du côté bleu (équipe 100)
+python draft_model.py --blue top=Garen,jungle=LeeSin,mid=Ahri,bot=Jinx,sup=Thresh \
+                      --red top=Darius,jungle=Vi,mid=Zed,bot=Caitlyn,sup=Lulu
+
+# Meilleurs picks mid pour le côté bleu, le reste de la draft étant connu (rôle vide = à choisir)
+python draft_model.py --rank mid --blue top=Garen,jungle=LeeSin,bot=Jinx,sup=Thresh \
+                      --red top=Darius,jungle=Vi,mid=Zed,bot=Caitlyn,sup=Lulu
+"""
+
+from __future__ import annotations
+import argparse, itertools, pickle
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Tuple
+import numpy as np
+import pandas as pd
+
+try:
+    import scipy.sparse as sp
+    from sklearn.linear_model import SGDClassifier
+except Exception as e:
+    raise SystemExit("Installe: pip install scipy scikit-learn\n" + str(e))
+
+import profiling
+from lol_matchups_test import DATA_DIR, PARSE_BATCH, ROLE_MAP, flatten_match_lines, iter_complete_matches
+
+MODEL_PATH = DATA_DIR / "draft_model.pkl"
+ROLES = list(ROLE_MAP.values())          # top, jungle, mid, bot, sup
+SIDES = {100: 0, 200: 1}                 # 0 = bleu, 1 = rouge
+CAPACITY = 256                           # champions max (~170 aujourd'hui)
+
+Draft = Tuple[Dict[str, str], Dict[str, str]]   # (bleu {rôle: champion}, rouge {rôle: champion})
+
+
+class DraftModel:
+    def __init__(self, capacity: int = CAPACITY, alpha: float = 1e-5, eta0: float = 0.01):
+        self.capacity = capacity
+        self.vocab: Dict[str, int] = {}
+        # pas constant : le pas "optimal" (1 / (alpha * t)) diverge sur ces features one-hot
+        self.clf = SGDClassifier(loss="log_loss", alpha=alpha, learning_rate="constant", eta0=eta0)
+        self.seen = np.zeros(0, dtype=np.uint64)   # matchIds hachés, triés
+        self.n_matches = 0
+
+    @property
+    def n_features(self) -> int:
+        return len(SIDES) * len(ROLES) * self.capacity
+
+    # --------- Vocabulaire ----------
+    def champ_ids(self, champs: pd.Series, grow: bool = False) -> np.ndarray:
+        """Indices des champions ; inconnus -> -1 (ou ajoutés si grow=True)."""
+        if grow:
+            for c in champs.unique():
+                if c not in self.vocab:
+                    if len(self.vocab) >= self.capacity:
+                        raise SystemExit(f"Vocabulaire plein ({self.capacity} champions) : ré-entraîne avec --capacity plus grand.")
+                    self.vocab[c] = len(self.vocab)
+        return champs.map(self.vocab).fillna(-1).to_numpy(dtype=np.int64)
+
+    # --------- Matrices creuses ----------
+    def design_matrix(self, df: pd.DataFrame, grow: bool = False) -> Tuple[sp.csr_matrix, np.ndarray, np.ndarray]:
+        """
+        df : lignes participants (matchId, teamId, win, role, champ) de matchs complets.
+        Retourne (X [n_matchs, n_features] CSR, y = victoire du côté bleu, matchIds).
+        Les matchs dont les 10 emplacements (côté, rôle) ne sont pas tous distincts sont ignorés.
+        """
+        side = df["teamId"].map(SIDES)
+        role = df["role"].map({r: i for i, r in enumerate(ROLES)})
+        ok = side.notna() & role.notna()
+        df = df[ok].assign(slot=(side[ok] * len(ROLES) + role[ok]).astype(np.int64))
+        df = df.drop_duplicates(["matchId", "slot"])
+        df = df[df.groupby("matchId")["slot"].transform("size").eq(10)]
+        df = df.sort_values(["matchId", "slot"], kind="stable")   # emplacements 0..9 par match
+
+        champ = self.champ_ids(df["champ"], grow=grow).reshape(-1, 10)
+        X = self.csr(np.arange(10) * self.capacity + champ, champ >= 0)
+        y = df["win"].to_numpy().reshape(-1, 10)[:, 0].astype(np.int8)   # emplacement 0 = bleu
+        return X, y, df["matchId"].to_numpy()[::10]
+
+    def csr(self, cols: np.ndarray, known: np.ndarray) -> sp.csr_matrix:
+        """cols [n, k] indices de colonnes ; known [n, k] masque (champion inconnu -> pas de feature)."""
+        nnz = known.sum(axis=1)
+        indptr = np.concatenate([[0], np.cumsum(nnz)])
+        return sp.csr_matrix((np.ones(int(indptr[-1]), dtype=np.float32), cols[known], indptr),
+                             shape=(len(cols), self.n_features))
+
+    def draft_matrix(self, drafts: List[Draft]) -> sp.csr_matrix:
+        """Drafts -> CSR en un seul passage (rôles absents ou champions inconnus : pas de feature)."""
+        n = len(drafts)
+        champs = [team.get(r) for blue_red in drafts for team in blue_red for r in ROLES]
+        champ = np.fromiter((self.vocab.get(c, -1) if c else -1 for c in champs), dtype=np.int64,
+                            count=n * 10).reshape(n, 10)
+        return self.csr(np.arange(10) * self.capacity + champ, champ >= 0)
+
+    # --------- Entraînement ----------
+    def new_matches(self, match_ids: np.ndarray) -> np.ndarray:
+        h = pd.util.hash_array(match_ids.astype(object))
+        fresh = ~np.isin(h, self.seen)
+        self.seen = np.union1d(self.seen, h[fresh])
+        return fresh
+
+    def partial_fit(self, df: pd.DataFrame) -> Dict[str, float]:
+        """
+        Un mini-batch : test-puis-entraînement (log-loss / précision mesurées AVANT la mise à jour,
+        donc sur des matchs que le modèle n'a jamais vus).
+        """
+        with profiling.stage("features"):
+            X, y, ids = self.design_matrix(df, grow=True)
+            fresh = self.new_matches(ids)
+            X, y = X[fresh], y[fresh]
+        if not len(y):
+            return {"n": 0}
+        out: Dict[str, float] = {"n": len(y)}
+        with profiling.stage("fit"):
+            if self.n_matches:
+                p = np.clip(self.clf.predict_proba(X)[:, 1], 1e-7, 1 - 1e-7)
+                out["logloss"] = float(-np.mean(y * np.log(p) + (1 - y) * np.log(1 - p)))
+                out["accuracy"] = float(np.mean((p >= 0.5) == y))
+            self.clf.partial_fit(X, y, classes=np.array([0, 1]))
+        self.n_matches += len(y)
+        return out
+
+    # --------- Prédiction ----------
+    def predict(self, drafts: List[Draft]) -> np.ndarray:
+        """P(victoire du côté bleu) pour chaque draft, en un seul appel."""
+        if not self.n_matches:
+            raise SystemExit("Modèle non entraîné. Lance d'abord: python draft_model.py --train ...")
+        return self.clf.predict_proba(self.draft_matrix(drafts))[:, 1]
+
+    def rank_candidates(self, blue: Dict[str, str], red: Dict[str, str], role: str, side: str = "blue",
+                        candidates: Iterable[str] | None = None, topk: int | None = None) -> pd.DataFrame:
+        """Complète `role` du côté `side` avec chaque candidat (tout le vocabulaire par défaut) et trie."""
+        candidates = [c for c in (candidates or self.vocab) if c in self.vocab]
+        taken = set(blue.values()) | set(red.values())
+        candidates = [c for c in candidates if c not in taken]
+        if side == "blue":
+            drafts = [({**blue, role: c}, red) for c in candidates]
+        else:
+            drafts = [(blue, {**red, role: c}) for c in candidates]
+        p = self.predict(drafts) if drafts else np.zeros(0)
+        win = p if side == "blue" else 1 - p
+        out = pd.DataFrame({"role": role, "champ": candidates, "win_prob": win})
+        out = out.sort_values("win_prob", ascending=False)
+        return out.head(topk) if topk else out
+
+    # --------- Persistance ----------
+    def save(self, path: Path = MODEL_PATH) -> None:
+        # état brut plutôt que l'objet : le pickle reste lisible que le module soit lancé en script ou importé
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as f:
+            pickle.dump({"capacity": self.capacity, "vocab": self.vocab, "clf": self.clf,
+                         "seen": self.seen, "n_matches": self.n_matches}, f)
+
+    @classmethod
+    def load(cls, path: Path = MODEL_PATH) -> "DraftModel":
+        if not path.exists():
+            raise SystemExit(f"{path} introuvable. Lance d'abord: python draft_model.py --train ...")
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+        model = cls(capacity=state["capacity"])
+        model.vocab = state["vocab"]; model.clf = state["clf"]
+        model.seen = state["seen"]; model.n_matches = state["n_matches"]
+        return model
+
+
+# ===============================
+#   FLUX D'ENTRAÎNEMENT
+# ===============================
+def iter_training_chunks(path: Path, chunksize: int = 200_000) -> Iterator[pd.DataFrame]:
+    """
+    Morceaux de matchs complets (matchId, teamId, win, role, champ) depuis
+    participants.csv / matches.db (lecture par morceaux) ou matches_raw.jsonl (lots de lignes).
+    """
+    if path.suffix != ".jsonl":
+        yield from iter_complete_matches(path, chunksize)
+        return
+    if not path.exists():
+        raise SystemExit(f"{path} introuvable. Lance d'abord une collecte.")
+    lines_per_chunk = max(PARSE_BATCH, chunksize // 10)   # ~10 lignes participants par match
+    with path.open("r", encoding="utf-8") as f:
+        while True:
+            batch = list(itertools.islice(f, lines_per_chunk))
+            if not batch:
+                break
+            df = flatten_match_lines(batch)
+            if not df.empty:
+                yield df
+
+
+def train(path: Path, model_path: Path = MODEL_PATH, chunksize: int = 200_000, reset: bool = False,
+          capacity: int = CAPACITY, alpha: float = 1e-5, eta0: float = 0.01) -> DraftModel:
+    model = DraftModel(capacity=capacity, alpha=alpha, eta0=eta0) if reset or not model_path.exists() else DraftModel.load(model_path)
+    before = model.n_matches
+    for df in iter_training_chunks(path, chunksize):
+        stats = model.partial_fit(df)
+        if stats.get("logloss") is not None:
+            print(f"[DRAFT] +{stats['n']} matchs, log-loss={stats['logloss']:.4f}, "
+                  f"précision={stats['accuracy']:.3f} (avant mise à jour)")
+    with profiling.stage("write"):
+        model.save(model_path)
+    print(f"[DRAFT] {model.n_matches - before} nouveaux matchs ({model.n_matches} au total, "
+          f"{len(model.vocab)} champions) -> {model_path}")
+    return model
+
+
+# ===============================
+#               CLI
+# ===============================
+def check_role(role: str) -> str:
+    role = role.strip().lower()
+    if role not in ROLES:
+        raise SystemExit(f"Rôle inconnu: {role} (attendu: {'/'.join(ROLES)})")
+    return role
+
+
+def parse_team(spec: str | None) -> Dict[str, str]:
+    """'top=Garen,mid=Ahri' -> {'top': 'Garen', 'mid': 'Ahri'}"""
+    team: Dict[str, str] = {}
+    for part in (spec or "").split(","):
+        if part.strip():
+            role, champ = part.split("=", 1)
+            team[check_role(role)] = champ.strip()
+    return team
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Modèle de probabilité de victoire d'une draft (one-hot creux + SGD)")
+    ap.add_argument("--train", type=str, metavar="PATH", help="participants.csv / matches.db / matches_raw.jsonl")
+    ap.add_argument("--model", type=str, default=str(MODEL_PATH), help="Fichier du modèle (pickle)")
+    ap.add_argument("--chunksize", type=int, default=200_000, help="Lignes participants par mini-batch")
+    ap.add_argument("--reset", action="store_true", help="Repart de zéro au lieu de mettre le modèle à jour")
+    ap.add_argument("--capacity", type=int, default=CAPACITY, help="Champions max du vocabulaire (nouveau modèle)")
+    ap.add_argument("--alpha", type=float, default=1e-5, help="Régularisation L2 (nouveau modèle)")
+    ap.add_argument("--eta0", type=float, default=0.01, help="Pas SGD constant (nouveau modèle)")
+    ap.add_argument("--blue", type=str, help="Draft bleue: role=Champion,... (équipe 100)")
+    ap.add_argument("--red", type=str, help="Draft rouge: role=Champion,... (équipe 200)")
+    ap.add_argument("--rank", type=str, metavar="ROLE", help="Classe les champions pour ce rôle (vide dans la draft)")
+    ap.add_argument("--side", choices=["blue", "red"], default="blue", help="Côté qui choisit (--rank)")
+    ap.add_argument("--topk", type=int, default=10, help="Top K (--rank)")
+    ap.add_argument("--profile", action="store_true", help="Temps + pic mémoire par étape: read, validate, features, fit")
+    args = ap.parse_args()
+
+    if args.profile: profiling.enable()
+    try:
+        model_path = Path(args.model)
+        if args.train:
+            train(Path(args.train), model_path, chunksize=args.chunksize, reset=args.reset,
+                  capacity=args.capacity, alpha=args.alpha, eta0=args.eta0)
+        if not (args.blue or args.red):
+            return
+        model = DraftModel.load(model_path)
+        blue, red = parse_team(args.blue), parse_team(args.red)
+        if args.rank:
+            role = check_role(args.rank)
+            if role in (blue if args.side == "blue" else red):
+                raise SystemExit(f"--rank {role}: ce rôle est déjà pris côté {args.side}.")
+            print(model.rank_candidates(blue, red, role, side=args.side, topk=args.topk)
+                  .to_string(index=False))
+        else:
+            print(f"[DRAFT] P(victoire bleue) = {model.predict([(blue, red)])[0]:.3f}")
+    finally:
+        profiling.finish()
+
+
+if __name__ == "__main__":
+    main()
@@ -13,25 +13,47 @@ python lol_matchups_test.py --demo --build
 python lol_matchups_test.py --riot --api-key RGAPI-XXXX \
   --platform EUW1 --region europe --name ztheo17 --tag EUW --count 100 --build
 
-# 3) Recommandations (après build)
+# 3) Build depuis la sortie de data_base_riot.py (lecture par morceaux)
+python lol_matchups_test.py --participants data_db/participants.csv
+python lol_matchups_test.py --participants data_db/matches.db
+
+# 4) Recommandations (après build)
 python lol_matchups_test.py --recommend --role mid --enemy Zed --topk 5 --min-games 20
+
+# 5) Recommandations sur les 3 derniers patchs / avec décroissance par patch
+python lol_matchups_test.py --recommend --role mid --enemy Zed --last-patches 3
+python lol_matchups_test.py --recommend --role mid --enemy Zed --decay 0.7
+
+# 6) Mode approché en mémoire fixe (count-min + heavy hitters), avec bornes d'erreur
+python lol_matchups_test.py --participants data_db/participants.csv --approx
+python lol_matchups_test.py --recommend --role mid --enemy Zed --approx
 """
 
 from __future__ import annotations
 import argparse
+import itertools
 import json
 import os
 import random
+import sqlite3
 import time
+from contextlib import closing
 from pathlib import Path
+import numpy as np
 import pandas as pd
 
+import profiling
+from matchup_sketch import MatchupSketch, DEFAULT_WIDTH, DEFAULT_DEPTH, DEFAULT_HEAVY
+
 # ===============================
 #          CONSTANTES
 # ===============================
 DATA_DIR = Path("data")
 RAW_PATH = DATA_DIR / "matches_raw.jsonl"
 MATCHUPS_CSV = DATA_DIR / "matchups.csv"
+CUBE_PATH = DATA_DIR / "matchups_cube.npz"
+SKETCH_PATH = DATA_DIR / "matchups_sketch.npz"
+PARSE_BATCH = 1000  # lignes JSONL décodées par lot
 
 ROLE_MAP = {
     "TOP": "top",
@@ -50,24 +72,33 @@ DEMO_ROLES = ["top","jungle","mid","bot","sup"]
 # ===============================
 #           DEMO MODE
 # ===============================
-def demo_generate_matches(n_matches: int = 200) -> pd.DataFrame:
+def demo_generate_matches(n_matches: int = 200, n_patches: int = 4) -> pd.DataFrame:
     """
     Génère des matchs synthétiques (5 rôles x 2 équipes) pour tester la chaîne complète.
+    Les matchs sont répartis sur `n_patches` patchs (14.1, 14.2, …) et Zed mid
+    est un peu plus fort à chaque patch, pour voir l'effet de --last-patches.
     """
     rows = []
     for m in range(n_matches):
         match_id = f"DEMO_{m:06d}"
+        patch_idx = m * n_patches // max(n_matches, 1)
+        version = f"14.{patch_idx + 1}.{500 + patch_idx}.1"
         ally = {r: random.choice(DEMO_CHAMPS) for r in DEMO_ROLES}
         enemy = {r: random.choice([c for c in DEMO_CHAMPS if c != ally[r]] or DEMO_CHAMPS) for r in DEMO_ROLES}
 
         bias = 0.0
         if ally["bot"] == "Jinx" and ally["sup"] == "Thresh": bias += 0.02
         if enemy["bot"] == "Jinx" and enemy["sup"] == "Thresh": bias -= 0.02
+        zed_buff = 0.05 * (patch_idx - (n_patches - 1) / 2)
+        if ally["mid"] == "Zed": bias += zed_buff
+        if enemy["mid"] == "Zed": bias -= zed_buff
         ally_win = random.random() < (0.50 + bias)
 
         for r in DEMO_ROLES:
-            rows.append({"matchId": match_id, "teamId": 100, "win": ally_win, "role": r, "champ": ally[r]})
-            rows.append({"matchId": match_id, "teamId": 200, "win": (not ally_win), "role": r, "champ": enemy[r]})
+            rows.append({"matchId": match_id, "teamId": 100, "win": ally_win, "role": r, "champ": ally[r],
+                         "gameVersion": version})
+            rows.append({"matchId": match_id, "teamId": 200, "win": (not ally_win), "role": r, "champ": enemy[r],
+                         "gameVersion": version})
     return pd.DataFrame(rows)
 
 
@@ -87,7 +118,8 @@ def save_raw_from_df(df: pd.DataFrame) -> None:
                     "teamPosition": inv.get(row["role"], "MIDDLE"),
                     "championName": row["champ"],
                 })
-            m = {"metadata": {"matchId": mid}, "info": {"participants": parts, "gameVersion": "DEMO-1.0"}}
+            version = sub["gameVersion"].iloc[0] if "gameVersion" in sub else "DEMO-1.0"
+            m = {"metadata": {"matchId": mid}, "info": {"participants": parts, "gameVersion": version}}
             f.write(json.dumps(m) + "\n")
 
 
@@ -96,7 +128,9 @@ def save_raw_from_df(df: pd.DataFrame) -> None:
 # ===============================
 def riot_collect(api_key: str, platform: str, region: str,
                  game_name: str, tag_line: str,
-                 queue: int = 420, count: int = 200, pause_sec: float = 1.2) -> None:
+                 queue: int = 420, count: int = 200, pause_sec: float = 1.2,
+                 base_url: str | None = None, api_keys: list | None = None,
+                 key_limits: str | None = None) -> None:
     """
     1) Récupère PUUID via account-v1 (RiotWatcher), avec fallback via summoner-v4 si besoin
     2) Récupère une liste de matchIds (match-v5)
@@ -105,78 +139,104 @@ def riot_collect(api_key: str, platform: str, region: str,
     print("[RIOT] Import des clients Riot…")
     try:
         # RiotWatcher: pour /riot/account/v1
-        # LolWatcher : pour /lol/... (match, summoner, league, etc.)
-        from riotwatcher import RiotWatcher, LolWatcher, ApiError
+        # LolWatcher : pour /lol/... (match, summoner, league, etc.), créés par riot_keys.KeyPool
+        from riotwatcher import ApiError
     except Exception as e:
         raise SystemExit("riotwatcher n'est pas installé. Fais: pip install riotwatcher\n" + str(e))
+    from riot_retry import RetryScheduler, DeferredRetryQueue, TransientError
+    from riot_keys import KeyPool, DEV_KEY_LIMITS, riot_base_url
 
-    rw = RiotWatcher(api_key)  # account-v1
-    lol = LolWatcher(api_key)  # lol/match-v5 + summoner-v4
+    # Pool de clés (une seule par défaut) : mêmes appels que RiotWatcher / LolWatcher
+    pool = KeyPool(api_keys or [api_key], limits=key_limits or DEV_KEY_LIMITS)
+    rw = pool.riot()  # account-v1
+    lol = pool.lol()  # lol/match-v5 + summoner-v4
 
-    DATA_DIR.mkdir(exist_ok=True)
+    # Serveur alternatif (ex: riot_mock_server.py) ; après les watchers, qui réinitialisent l'URL
+    with riot_base_url(base_url):
 
-    # 1) PUUID
-    print(f"[RIOT] account.by_riot_id(region={region}, name={game_name}, tag={tag_line})")
-    try:
-        acct = rw.account.by_riot_id(region, game_name, tag_line)
-        puuid = acct.get("puuid")
-        if not puuid:
-            raise ValueError("PUUID manquant dans la réponse account-v1")
-        print("[RIOT] PUUID acquis via account-v1")
-    except Exception as e:
-        print(f"[RIOT] Impossible via account-v1 ({e}). Fallback summoner-v4 avec platform={platform} …")
-        # Fallback : ancien flux par nom de summoner (sans tag)
+        DATA_DIR.mkdir(exist_ok=True)
+
+        # 1) PUUID
+        print(f"[RIOT] account.by_riot_id(region={region}, name={game_name}, tag={tag_line})")
         try:
-            summ = lol.summoner.by_name(platform, game_name)
-            puuid = summ.get("puuid")
+            acct = rw.account.by_riot_id(region, game_name, tag_line)
+            puuid = acct.get("puuid")
             if not puuid:
-                raise ValueError("PUUID manquant dans la réponse summoner-v4")
-            print("[RIOT] PUUID acquis via summoner-v4 (fallback)")
-        except ApiError as ee:
-            raise SystemExit(f"[RIOT] summoner.by_name ERROR: {ee}")
-
-    # 2) Liste de matchs
-    print(f"[RIOT] matchlist_by_puuid(region={region}, count={count}, queue={queue})")
-    try:
-        match_ids = lol.match.matchlist_by_puuid(region, puuid, type="ranked", queue=queue, count=count)
-    except ApiError as e:
-        raise SystemExit(f"[RIOT] matchlist_by_puuid ERROR: {e}")
-    print(f"[RIOT] {len(match_ids)} matchIds récupérés")
-
-    # Dé-duplication
-    seen = set()
-    if RAW_PATH.exists():
-        with RAW_PATH.open("r", encoding="utf-8") as f:
-            for line in f:
-                try:
-                    m = json.loads(line)
-                    mid0 = m.get("metadata", {}).get("matchId")
-                    if mid0:
-                        seen.add(mid0)
-                except Exception:
-                    pass
-
-    # 3) Téléchargement des matchs
-    print("[RIOT] Téléchargement des matchs…")
-    fetched = 0
-    with RAW_PATH.open("a", encoding="utf-8") as f:
-        for i, mid in enumerate(match_ids, 1):
-            if mid in seen:
-                continue
+                raise ValueError("PUUID manquant dans la réponse account-v1")
+            print("[RIOT] PUUID acquis via account-v1")
+        except Exception as e:
+            print(f"[RIOT] Impossible via account-v1 ({e}). Fallback summoner-v4 avec platform={platform} …")
+            # Fallback : ancien flux par nom de summoner (sans tag)
             try:
-                mat = lol.match.by_id(region, mid)
-                f.write(json.dumps(mat) + "\n")
-                fetched += 1
+                summ = lol.summoner.by_name(platform, game_name)
+                puuid = summ.get("puuid")
+                if not puuid:
+                    raise ValueError("PUUID manquant dans la réponse summoner-v4")
+                print("[RIOT] PUUID acquis via summoner-v4 (fallback)")
+            except ApiError as ee:
+                raise SystemExit(f"[RIOT] summoner.by_name ERROR: {ee}")
+
+        # 2) Liste de matchs
+        print(f"[RIOT] matchlist_by_puuid(region={region}, count={count}, queue={queue})")
+        retry = RetryScheduler()
+        try:
+            match_ids = retry.call(lol.match.matchlist_by_puuid, region, puuid, type="ranked", queue=queue, count=count)
+        except (ApiError, TransientError) as e:
+            raise SystemExit(f"[RIOT] matchlist_by_puuid ERROR: {e}")
+        print(f"[RIOT] {len(match_ids)} matchIds récupérés")
+
+        # Dé-duplication
+        seen = set()
+        if RAW_PATH.exists():
+            with RAW_PATH.open("r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        m = json.loads(line)
+                        mid0 = m.get("metadata", {}).get("matchId")
+                        if mid0:
+                            seen.add(mid0)
+                    except Exception:
+                        pass
+
+        # 3) Téléchargement des matchs
+        print("[RIOT] Téléchargement des matchs…")
+        fetched = 0
+        deferred = DeferredRetryQueue()  # matchIds en échec temporaire (5xx, réseau, circuit ouvert)
+
+        def download(mid: str) -> None:
+            nonlocal fetched
+            try:
+                mat = retry.call(lol.match.by_id, region, mid)
+            except TransientError as e:
+                print(f"[RIOT] {mid} différé: {e}")
+                deferred.defer(mid, e)
+                return
+            except ApiError as e:
+                print(f"[RIOT] Skip {mid}: {e}")
+                deferred.fail(mid, e)
+                return
+            deferred.done(mid)
+            f.write(json.dumps(mat) + "\n")
+            fetched += 1
+            time.sleep(pause_sec / len(pool))  # spacing simple pour éviter 429 (budget réparti sur les clés)
+
+        with RAW_PATH.open("a", encoding="utf-8") as f:
+            for i, mid in enumerate(match_ids, 1):
+                for ready in deferred.pop_ready():
+                    download(ready)
+                if mid in seen:
+                    continue
+                download(mid)
                 if i % 10 == 0:
                     print(f"[RIOT] {i}/{len(match_ids)} traités ({fetched} nouveaux)")
-                time.sleep(pause_sec)  # spacing simple pour éviter 429
-            except ApiError as e:
-                if getattr(e, "response", None) and e.response.status_code == 429:
-                    print("[RIOT] 429 rate limit → pause 3s")
-                    time.sleep(3.0)
-                else:
-                    print(f"[RIOT] Skip {mid}: {e}")
-    print(f"[RIOT] Terminé. Nouveaux matchs: {fetched}. Fichier: {RAW_PATH}")
+            # derniers retries
+            while deferred:
+                time.sleep(deferred.next_ready_in() or 0.0)
+                for ready in deferred.pop_ready():
+                    download(ready)
+        print(f"[RIOT] Terminé. Nouveaux matchs: {fetched}. Fichier: {RAW_PATH}")
+        print(f"[RIOT] Retries: {deferred.summary()}")
+        print(f"[RIOT] Clés: {pool.summary()}")
 
 
 # ===============================
@@ -184,65 +244,272 @@ def riot_collect(api_key: str, platform: str, region: str,
 # ===============================
 def flatten_matches(jsonl_path: Path) -> pd.DataFrame:
     """
-    Transforme le JSONL brut en DF (matchId, teamId, win, role, champ), 
+    Transforme le JSONL brut en DF (matchId, teamId, win, role, champ, patch), 
     garde seulement les matchs avec 5 rôles par équipe (10 lignes).
     """
-    rows = []
     if not jsonl_path.exists():
-        return pd.DataFrame(columns=["matchId","teamId","win","role","champ"])
+        return pd.DataFrame(columns=["matchId","teamId","win","role","champ","patch"])
 
     with jsonl_path.open("r", encoding="utf-8") as f:
-        for line in f:
-            try:
-                m = json.loads(line)
-            except Exception:
-                continue
-            info = m.get("info", {})
-            parts = info.get("participants", [])
-            if not parts:
-                continue
-            for p in parts:
-                role_key = (p.get("teamPosition") or "").upper()
-                role = ROLE_MAP.get(role_key)
-                if not role:
-                    # ignore ARAM / positions inconnues
+        df = flatten_match_lines(f)
+    print(f"[BUILD] Matches valides (5 rôles x 2 équipes): {df['matchId'].nunique()}")
+    return df
+
+
+def flatten_match_lines(lines) -> pd.DataFrame:
+    """
+    Même parseur que flatten_matches, mais sur un itérable de lignes JSONL
+    (utile pour traiter uniquement les lignes ajoutées pendant une collecte).
+    Les lignes sont décodées par lots de PARSE_BATCH (étapes parse / flatten séparées pour --profile).
+    """
+    rows = []
+    lines = iter(lines)
+    while True:
+        with profiling.stage("parse"):
+            matches = []
+            for line in itertools.islice(lines, PARSE_BATCH):
+                try:
+                    matches.append(json.loads(line))
+                except Exception:
                     continue
-                rows.append({
-                    "matchId": m.get("metadata", {}).get("matchId"),
-                    "teamId": p.get("teamId"),
-                    "win": bool(p.get("win")),
-                    "role": role,
-                    "champ": p.get("championName"),
-                })
+        if not matches:
+            break
+        with profiling.stage("flatten"):
+            for m in matches:
+                info = m.get("info", {})
+                parts = info.get("participants", [])
+                if not parts:
+                    continue
+                patch = patch_of(info.get("gameVersion"))
+                for p in parts:
+                    role_key = (p.get("teamPosition") or "").upper()
+                    role = ROLE_MAP.get(role_key)
+                    if not role:
+                        # ignore ARAM / positions inconnues
+                        continue
+                    rows.append({
+                        "matchId": m.get("metadata", {}).get("matchId"),
+                        "teamId": p.get("teamId"),
+                        "win": bool(p.get("win")),
+                        "role": role,
+                        "champ": p.get("championName"),
+                        "patch": patch,
+                    })
+
+    if not rows:
+        return pd.DataFrame(columns=["matchId","teamId","win","role","champ","patch"])
+    with profiling.stage("flatten"):
+        df = pd.DataFrame(rows)
+    with profiling.stage("validate"):
+        return keep_complete_matches(df)
+
+
+def patch_of(game_version) -> str:
+    """
+    "14.3.512.1234" -> "14.3" ; version absente ou non numérique -> "unknown".
+    """
+    parts = str(game_version or "").split(".")
+    if len(parts) >= 2 and parts[0].isdigit() and parts[1].isdigit():
+        return f"{int(parts[0])}.{int(parts[1])}"
+    return "unknown"
+
+
+def patch_sort_key(patch: str):
+    """
+    Tri chronologique des patchs ("unknown" en premier, 14.10 après 14.9).
+    """
+    try:
+        return (1, tuple(int(x) for x in patch.split(".")))
+    except ValueError:
+        return (0, ())
+
 
-    df = pd.DataFrame(rows)
+def keep_complete_matches(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Garde seulement les matchs avec 5 rôles par équipe (10 lignes).
+    """
     valid = df.groupby("matchId").size().eq(10)  # 5 rôles x 2 équipes
-    df = df[df["matchId"].isin(valid[valid].index)]
-    print(f"[BUILD] Matches valides (5 rôles x 2 équipes): {df['matchId'].nunique()}")
-    return df
+    return df[df["matchId"].isin(valid[valid].index)]
 
 
-def compute_lane_matchups(df: pd.DataFrame) -> pd.DataFrame:
+def compute_lane_matchups(df: pd.DataFrame, verbose: bool = True, by_patch: bool = False) -> pd.DataFrame:
     """
     Calcule les winrates A vs B par rôle (duels lane-vs-lane).
+    by_patch=True : une ligne par (patch, role, champ_ally, champ_enemy).
     """
+    keys = (["patch"] if by_patch else []) + ["role","champ_ally","champ_enemy"]
     if df.empty:
-        return pd.DataFrame(columns=["role","champ_ally","champ_enemy","games","wins","winrate"])
+        return pd.DataFrame(columns=keys + ["games","wins","winrate"])
+
+    duel = lane_duels(df, by_patch=by_patch)
+    with profiling.stage("groupby"):
+        grp = duel.groupby(keys).agg(
+            games=("ally_win","size"),
+            wins=("ally_win","sum"),
+        ).reset_index()
+
+    grp = finalize_matchups(grp)
+    if verbose:
+        print(f"[BUILD] Paires rôle-vs-rôle: {len(grp)}")
+    return grp
+
 
-    left  = df[df.teamId == 100].groupby(["matchId","role"]).first().reset_index()
-    right = df[df.teamId == 200].groupby(["matchId","role"]).first().reset_index()
-    duel = left.merge(right, on=["matchId","role"], suffixes=("_ally","_enemy"))
+def lane_duels(df: pd.DataFrame, by_patch: bool = False) -> pd.DataFrame:
+    """
+    Une ligne par duel (match, rôle) : champ_ally (équipe 100) vs champ_enemy (équipe 200), ally_win 0/1.
+    """
+    with profiling.stage("merge"):
+        left  = df[df.teamId == 100].groupby(["matchId","role"]).first().reset_index()
+        right = df[df.teamId == 200].groupby(["matchId","role"]).first().reset_index()
+        duel = left.merge(right, on=["matchId","role"], suffixes=("_ally","_enemy"))
+        if by_patch:
+            duel["patch"] = duel["patch_ally"]
+        duel["ally_win"] = duel["win_ally"].astype(int)
+    return duel
 
-    duel["ally_win"] = duel["win_ally"].astype(int)
-    grp = duel.groupby(["role","champ_ally","champ_enemy"]).agg(
-        games=("ally_win","size"),
-        wins=("ally_win","sum"),
-    ).reset_index()
 
+def finalize_matchups(grp: pd.DataFrame) -> pd.DataFrame:
+    """
+    Ajoute le winrate et trie comme matchups.csv (role, champ_ally, games décroissant).
+    """
     grp["winrate"] = grp["wins"] / grp["games"].where(grp["games"].ne(0), 1)
-    grp = grp.sort_values(["role","champ_ally","games"], ascending=[True,True,False])
-    print(f"[BUILD] Paires rôle-vs-rôle: {len(grp)}")
-    return grp
+    return grp.sort_values(["role","champ_ally","games"], ascending=[True,True,False])
+
+
+def merge_matchups(frames, by_patch: bool = False) -> pd.DataFrame:
+    """
+    Additionne des agrégats partiels (games/wins) calculés sur des lots de matchs disjoints.
+    Le résultat est identique à compute_lane_matchups sur l'union des lots
+    (par patch si by_patch=True, sinon toutes versions confondues).
+    """
+    keys = (["patch"] if by_patch else []) + ["role","champ_ally","champ_enemy"]
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        return pd.DataFrame(columns=keys + ["games","wins","winrate"])
+    with profiling.stage("groupby"):
+        grp = pd.concat(frames, ignore_index=True).groupby(keys).agg(
+            games=("games","sum"),
+            wins=("wins","sum"),
+        ).reset_index()
+        return finalize_matchups(grp)
+
+
+# ===============================
+#   BUILD DEPUIS participants.csv
+# ===============================
+# colonnes de data_base_riot.py -> schéma de flatten_matches
+PARTICIPANT_COLUMNS = {"matchId": "matchId", "teamId": "teamId", "teamWin": "win",
+                       "role": "role", "championName": "champ", "patch": "patch"}
+# participants.csv du collecteur d'origine : pas de ligne d'en-tête, colonnes dans cet ordre
+LEGACY_PARTICIPANT_COLUMNS = ["matchId", "teamId", "teamWin", "winnerTeamId", "role", "championName",
+                              "kills", "deaths", "assists", "kda_ratio", "summoner1Id", "summoner2Id", "puuid"]
+
+
+def check_participant_columns(path: Path, present) -> None:
+    missing = [c for c in PARTICIPANT_COLUMNS if c != "patch" and c not in present]
+    if missing:
+        raise SystemExit(f"{path}: colonnes manquantes {missing} (attendu: sortie de data_base_riot.py).")
+
+
+def iter_participant_chunks(path: Path, chunksize: int):
+    """
+    Lit participants.csv (ou la table participants de matches.db) par morceaux de
+    `chunksize` lignes, renommés au schéma (matchId, teamId, win, role, champ, patch).
+    Les fichiers antérieurs à la colonne patch sont lus avec patch="unknown" (et ceux du
+    collecteur d'origine, sans ligne d'en-tête, avec LEGACY_PARTICIPANT_COLUMNS).
+    Colonnes obligatoires absentes : SystemExit plutôt qu'un build vide.
+    """
+    if path.suffix in (".db", ".sqlite"):
+        with closing(sqlite3.connect(path)) as conn:
+            present = {r[1] for r in conn.execute("PRAGMA table_info(participants)")}
+            check_participant_columns(path, present)
+            cols = ", ".join(c if c in present else f"'unknown' AS {c}" for c in PARTICIPANT_COLUMNS)
+            # ORDER BY matchId suit la clé primaire : les lignes d'un match restent contiguës
+            query = f"SELECT {cols} FROM participants ORDER BY matchId"
+            for chunk in pd.read_sql_query(query, conn, chunksize=chunksize):
+                chunk["teamWin"] = chunk["teamWin"].astype(bool)
+                chunk["patch"] = chunk["patch"].fillna("unknown")
+                yield chunk.rename(columns=PARTICIPANT_COLUMNS)
+        return
+    if path.stat().st_size == 0:
+        raise SystemExit(f"{path} est vide.")
+    first = pd.read_csv(path, header=None, nrows=1, dtype=str).iloc[0].tolist()
+    kw = {}
+    if "matchId" not in first and len(first) == len(LEGACY_PARTICIPANT_COLUMNS):
+        kw = {"header": None, "names": LEGACY_PARTICIPANT_COLUMNS}   # fichier sans en-tête
+        first = LEGACY_PARTICIPANT_COLUMNS
+    check_participant_columns(path, first)
+    usecols = [c for c in PARTICIPANT_COLUMNS if c in first]
+    for chunk in pd.read_csv(path, usecols=usecols, chunksize=chunksize, dtype={"patch": str}, **kw):
+        chunk["patch"] = chunk["patch"].fillna("unknown") if "patch" in chunk else "unknown"
+        yield chunk.rename(columns=PARTICIPANT_COLUMNS)
+
+
+def iter_complete_matches(path: Path, chunksize: int = 200_000):
+    """
+    Morceaux de participants ne contenant que des matchs complets (5 rôles x 2 équipes).
+    Les lignes du dernier match d'un morceau sont gardées pour le morceau suivant
+    (un match peut être coupé à la frontière).
+    """
+    if not path.exists():
+        raise SystemExit(f"{path} introuvable. Lance d'abord data_base_riot.py.")
+
+    carry = None
+    n_matches = 0
+    n_rows = 0
+    chunks = iter_participant_chunks(path, chunksize)
+    while True:
+        with profiling.stage("read"):
+            chunk = next(chunks, None)
+        if chunk is None:
+            break
+        n_rows += len(chunk)
+        if carry is not None:
+            chunk = pd.concat([carry, chunk], ignore_index=True)
+        if chunk.empty:
+            continue
+        last = chunk["matchId"].iloc[-1]
+        tail = chunk["matchId"].eq(last)
+        carry, chunk = chunk[tail], chunk[~tail]
+
+        with profiling.stage("validate"):
+            df = keep_complete_matches(chunk)
+        if not df.empty:
+            n_matches += df["matchId"].nunique()
+            yield df
+        print(f"[BUILD] {n_rows} lignes lues, {n_matches} matchs valides")
+
+    if carry is not None:
+        df = keep_complete_matches(carry)
+        if not df.empty:
+            n_matches += df["matchId"].nunique()
+            yield df
+
+    print(f"[BUILD] Matches valides (5 rôles x 2 équipes): {n_matches}")
+
+
+def build_from_participants(path: Path, chunksize: int = 200_000) -> pd.DataFrame:
+    """
+    Même résultat que flatten_matches + compute_lane_matchups(by_patch=True), mais en streaming :
+    la mémoire dépend de la taille d'un morceau et du nombre de paires, pas du fichier.
+    """
+    agg = merge_matchups([], by_patch=True)
+    for df in iter_complete_matches(path, chunksize):
+        agg = merge_matchups([agg, compute_lane_matchups(df, verbose=False, by_patch=True)], by_patch=True)
+    return agg
+
+
+def sketch_from_participants(path: Path, chunksize: int = 200_000, width: int = DEFAULT_WIDTH,
+                             depth: int = DEFAULT_DEPTH, heavy_hitters: int = DEFAULT_HEAVY) -> MatchupSketch:
+    """
+    Mode approché (--approx) : les duels alimentent des sketches de taille fixe
+    (count-min games/wins + heavy hitters), au lieu de l'agrégat exact par paire.
+    """
+    sketch = MatchupSketch(width=width, depth=depth, heavy_hitters=heavy_hitters)
+    for df in iter_complete_matches(path, chunksize):
+        with profiling.stage("sketch"):
+            sketch.add_duels(lane_duels(df))
+    return sketch
 
 
 def save_matchups_csv(df: pd.DataFrame) -> None:
@@ -251,7 +518,126 @@ def save_matchups_csv(df: pd.DataFrame) -> None:
     print(f"[BUILD] matchups.csv écrit dans {MATCHUPS_CSV}")
 
 
-def recommend(role: str, enemy: str, topk: int = 5, min_games: int = 20) -> pd.DataFrame:
+# ===============================
+#   CUBE PAR PATCH (sommes préfixes)
+# ===============================
+def save_build_outputs(patch_agg: pd.DataFrame) -> pd.DataFrame:
+    """
+    À partir des agrégats par patch : écrit matchups.csv (toutes versions) et le cube par patch.
+    """
+    matchups = merge_matchups([patch_agg.drop(columns=["patch","winrate"])])
+    print(f"[BUILD] Paires rôle-vs-rôle: {len(matchups)}")
+    with profiling.stage("write"):
+        save_matchups_csv(matchups)
+    with profiling.stage("cube"):
+        cube = build_patch_cube(patch_agg)
+    with profiling.stage("write"):
+        save_patch_cube(cube)
+    return matchups
+
+
+def build_patch_cube(patch_agg: pd.DataFrame) -> dict:
+    """
+    Matérialise games/wins par partition (patch, role, ally, enemy) dans des tableaux denses
+    [P, R, C, C], stockés en sommes cumulées sur l'axe des patchs : la somme d'une plage de
+    patchs [a, b] vaut cum[b] - cum[a-1], sans relire les matchs.
+    """
+    patches = sorted(patch_agg["patch"].unique(), key=patch_sort_key)
+    roles = list(ROLE_MAP.values())
+    champs = sorted(set(patch_agg["champ_ally"]) | set(patch_agg["champ_enemy"]))
+    shape = (len(patches), len(roles), len(champs), len(champs))
+    # astype : sans ligne (aucun match complet), map() rend des tableaux object/float
+    idx = (
+        patch_agg["patch"].map({p: i for i, p in enumerate(patches)}).to_numpy().astype(np.int64),
+        patch_agg["role"].map({r: i for i, r in enumerate(roles)}).to_numpy().astype(np.int64),
+        patch_agg["champ_ally"].map({c: i for i, c in enumerate(champs)}).to_numpy().astype(np.int64),
+        patch_agg["champ_enemy"].map({c: i for i, c in enumerate(champs)}).to_numpy().astype(np.int64),
+    )
+    games = np.zeros(shape, dtype=np.int32)
+    wins = np.zeros(shape, dtype=np.int32)
+    np.add.at(games, idx, patch_agg["games"].to_numpy().astype(np.int32))
+    np.add.at(wins, idx, patch_agg["wins"].to_numpy().astype(np.int32))
+    return {
+        "patches": np.array(patches, dtype=str),
+        "roles": np.array(roles),
+        "champs": np.array(champs, dtype=str),
+        "cum_games": games.cumsum(axis=0, dtype=np.int32),
+        "cum_wins": wins.cumsum(axis=0, dtype=np.int32),
+    }
+
+
+def save_patch_cube(cube: dict) -> None:
+    DATA_DIR.mkdir(exist_ok=True)
+    np.savez_compressed(CUBE_PATH, **cube)
+    print(f"[BUILD] Cube par patch ({len(cube['patches'])} patchs) écrit dans {CUBE_PATH}")
+
+
+def load_patch_cube() -> dict:
+    if not CUBE_PATH.exists():
+        raise SystemExit("matchups_cube.npz introuvable. Relance --build (ou --participants).")
+    with np.load(CUBE_PATH) as z:
+        return {k: z[k] for k in z.files}
+
+
+def cube_window(cube: dict, role: str, enemy: str, last_patches: int | None = None,
+                decay: float | None = None):
+    """
+    games/wins de chaque allié contre `enemy` sur les `last_patches` derniers patchs.
+    Sans décroissance : une seule soustraction de sommes préfixes.
+    Avec décroissance : poids decay**âge sur les partitions de la fenêtre (âge 0 = dernier patch).
+    """
+    roles = list(cube["roles"]); champs = list(cube["champs"])
+    if role not in roles or enemy not in champs or len(cube["patches"]) == 0:
+        return np.zeros(0), np.zeros(0)
+    cg = cube["cum_games"][:, roles.index(role), :, champs.index(enemy)]  # [P, C]
+    cw = cube["cum_wins"][:, roles.index(role), :, champs.index(enemy)]
+    n = len(cg)
+    first = max(n - last_patches, 0) if last_patches else 0
+
+    if decay is None:
+        games = cg[-1] - (cg[first - 1] if first > 0 else 0)
+        wins = cw[-1] - (cw[first - 1] if first > 0 else 0)
+        return games, wins
+
+    per_g = np.diff(cg, axis=0, prepend=0)[first:]
+    per_w = np.diff(cw, axis=0, prepend=0)[first:]
+    weights = decay ** np.arange(n - first - 1, -1, -1, dtype=float)
+    return weights @ per_g, weights @ per_w
+
+
+def recommend_from_cube(role: str, enemy: str, topk: int = 5, min_games: float = 20,
+                        last_patches: int | None = None, decay: float | None = None) -> pd.DataFrame:
+    cube = load_patch_cube()
+    patches = list(cube["patches"])
+    first = max(len(patches) - last_patches, 0) if last_patches else 0
+    print(f"[RECO] Patchs {patches[first] if patches else '-'} -> {patches[-1] if patches else '-'}"
+          + (f", décroissance {decay}" if decay is not None else ""))
+    games, wins = cube_window(cube, role, enemy, last_patches=last_patches, decay=decay)
+    sub = pd.DataFrame({"role": role, "champ_ally": cube["champs"][:len(games)], "champ_enemy": enemy,
+                        "games": games, "wins": wins})
+    sub = sub[sub["games"] >= max(min_games, 1e-9)]
+    sub["winrate"] = sub["wins"] / sub["games"]
+    return sub.sort_values("winrate", ascending=False).head(topk)
+
+
+def recommend_approx(role: str, enemy: str, topk: int = 5, min_games: int = 20,
+                     sketch_path: Path = SKETCH_PATH) -> pd.DataFrame:
+    """
+    Recommandations depuis le sketch : games/wins sont des majorants à `err` près,
+    [winrate_low, winrate_high] encadre le vrai winrate.
+    """
+    sketch = MatchupSketch.load(sketch_path)
+    print(f"[APPROX] {sketch.describe()}")
+    sub = sketch.versus(role, enemy)
+    sub = sub[sub["games"] >= min_games]
+    return sub.sort_values("winrate", ascending=False).head(topk)
+
+
+def recommend(role: str, enemy: str, topk: int = 5, min_games: int = 20,
+              last_patches: int | None = None, decay: float | None = None) -> pd.DataFrame:
+    if last_patches or decay is not None:
+        return recommend_from_cube(role, enemy, topk=topk, min_games=min_games,
+                                   last_patches=last_patches, decay=decay)
     if not MATCHUPS_CSV.exists():
         raise SystemExit("matchups.csv introuvable. Lance d'abord --build (démo ou Riot).")
     m = pd.read_csv(MATCHUPS_CSV)
@@ -269,15 +655,21 @@ def build_argparser() -> argparse.ArgumentParser:
     mode.add_argument("--demo", action="store_true", help="Génère des matchs synthétiques (offline).")
     mode.add_argument("--riot", action="store_true", help="Collecte via Riot API (vrais matchs).")
     mode.add_argument("--recommend", action="store_true", help="Recommande les meilleurs picks vs un champion.")
+    mode.add_argument("--participants", type=str, metavar="PATH",
+                      help="Construit matchups.csv depuis participants.csv / matches.db (data_base_riot.py).")
 
     # Riot / routing
     p.add_argument("--api-key", type=str, help="Clé Riot (alternative à la variable d'environnement RIOT_API_KEY)")
+    p.add_argument("--api-keys-file", type=str, default=None,
+                   help="Pool de clés, une par ligne (même application : les PUUID sont chiffrés par app)")
+    p.add_argument("--key-limits", type=str, default=None, help="Budget par clé 'n:secondes,...' (défaut clé dev 20:1,100:120)")
     p.add_argument("--platform", type=str, default="EUW1", help="Plateforme (EUW1/NA1/KR/BR1/...)")
     p.add_argument("--region", type=str, default="europe", help="Regional routing pour match-v5 (europe/americas/asia/sea)")
     p.add_argument("--name", type=str, default=None, help="gameName (Riot ID avant le #)")
     p.add_argument("--tag", type=str, default=None, help="tagLine (Riot ID après le #)")
     p.add_argument("--queue", type=int, default=420, help="420=Ranked Solo, 440=Flex")
     p.add_argument("--count", type=int, default=200, help="Nb de matchs à collecter")
+    p.add_argument("--base-url", type=str, default=None, help="Serveur Riot alternatif (ex: riot_mock_server.py)")
 
     # Build & Recommend
     p.add_argument("--build", action="store_true", help="Construit matchups.csv depuis data/matches_raw.jsonl")
@@ -285,12 +677,37 @@ def build_argparser() -> argparse.ArgumentParser:
     p.add_argument("--enemy", type=str, default="Zed", help="Champion ennemi ciblé")
     p.add_argument("--topk", type=int, default=5, help="Top K recommandations")
     p.add_argument("--min-games", type=int, default=20, help="Seuil minimal de parties")
+    p.add_argument("--chunksize", type=int, default=200_000, help="Lignes lues par morceau (--participants)")
+    p.add_argument("--last-patches", type=int, default=None, help="Recommande sur les N derniers patchs seulement")
+    p.add_argument("--decay", type=float, default=None,
+                   help="Pondération par patch (ex: 0.7 -> patch précédent compte 0.7, celui d'avant 0.49)")
+    p.add_argument("--approx", action="store_true",
+                   help="Sketches en mémoire fixe (count-min + heavy hitters) au lieu de l'agrégat exact")
+    p.add_argument("--sketch-path", type=str, default=str(SKETCH_PATH), help="Sketch lu/écrit par --approx (un par shard)")
+    p.add_argument("--sketch-width", type=int, default=DEFAULT_WIDTH, help="Largeur count-min (erreur e/largeur * N)")
+    p.add_argument("--sketch-depth", type=int, default=DEFAULT_DEPTH, help="Profondeur count-min (confiance 1 - exp(-d))")
+    p.add_argument("--heavy-hitters", type=int, default=DEFAULT_HEAVY, help="Compteurs Misra-Gries (matchups les plus joués)")
+
+    # Profiling
+    p.add_argument("--profile", action="store_true",
+                   help="Temps + pic mémoire (tracemalloc) par étape: parse, flatten, validate, merge, groupby, write")
+    p.add_argument("--profile-out", type=str, default=None, metavar="DIR",
+                   help="Active --profile et écrit profile.pstats (cProfile) + stacks.collapsed (flamegraph)")
     return p
 
 
 def main():
     args = build_argparser().parse_args()
+    if not (args.profile or args.profile_out):
+        return run(args)
+    profiling.enable(args.profile_out)
+    try:
+        run(args)
+    finally:
+        profiling.finish()
+
 
+def run(args: argparse.Namespace) -> None:
     # Gestion de la clé
     if args.api_key:
         os.environ["RIOT_API_KEY"] = args.api_key
@@ -302,28 +719,56 @@ def main():
         print(f"[DEMO] Données brutes écrites dans {RAW_PATH}")
         if args.build:
             df = flatten_matches(RAW_PATH)
-            matchups = compute_lane_matchups(df)
-            save_matchups_csv(matchups)
+            matchups = save_build_outputs(compute_lane_matchups(df, verbose=False, by_patch=True))
             print(matchups.head(10).to_string(index=False))
         return
 
     if args.riot:
-        if not api_key:
-            raise SystemExit("RIOT_API_KEY absente. Fournis --api-key RGAPI-XXXX ou exporte la variable.")
+        api_keys = None
+        if args.api_keys_file:
+            from riot_keys import load_keys
+            api_keys = load_keys(Path(args.api_keys_file))
+        if not api_key and not api_keys:
+            raise SystemExit("RIOT_API_KEY absente. Fournis --api-key RGAPI-XXXX, --api-keys-file ou exporte la variable.")
         if not args.name or not args.tag:
             raise SystemExit("--name et --tag requis (Riot ID = gameName#tagLine).")
         riot_collect(api_key=api_key, platform=args.platform, region=args.region,
                      game_name=args.name, tag_line=args.tag,
-                     queue=args.queue, count=args.count)
+                     queue=args.queue, count=args.count, base_url=args.base_url,
+                     api_keys=api_keys, key_limits=args.key_limits)
         if args.build:
             df = flatten_matches(RAW_PATH)
-            matchups = compute_lane_matchups(df)
-            save_matchups_csv(matchups)
+            matchups = save_build_outputs(compute_lane_matchups(df, verbose=False, by_patch=True))
             print(matchups.head(10).to_string(index=False))
         return
 
+    if args.participants and args.approx:
+        sketch = sketch_from_participants(Path(args.participants), chunksize=args.chunksize,
+                                          width=args.sketch_width, depth=args.sketch_depth,
+                                          heavy_hitters=args.heavy_hitters)
+        with profiling.stage("write"):
+            sketch.save(Path(args.sketch_path))
+        print(f"[APPROX] Sketch écrit dans {args.sketch_path} : {sketch.describe()}")
+        print(sketch.top_matchups(10).to_string(index=False))
+        return
+
+    if args.participants:
+        matchups = save_build_outputs(build_from_participants(Path(args.participants), chunksize=args.chunksize))
+        print(matchups.head(10).to_string(index=False))
+        return
+
+    if args.recommend and args.approx:
+        rec = recommend_approx(role=args.role, enemy=args.enemy, topk=args.topk, min_games=args.min_games,
+                               sketch_path=Path(args.sketch_path))
+        if rec.empty:
+            print("Aucune reco (pas assez de données ou mauvais rôle/ennemi).")
+        else:
+            print(rec.to_string(index=False))
+        return
+
     if args.recommend:
-        rec = recommend(role=args.role, enemy=args.enemy, topk=args.topk, min_games=args.min_games)
+        rec = recommend(role=args.role, enemy=args.enemy, topk=args.topk, min_games=args.min_games,
+                        last_patches=args.last_patches, decay=args.decay)
         if rec.empty:
             print("Aucune reco (pas assez de données ou mauvais rôle/ennemi).")
         else:
@@ -1,5 +1,12 @@
+import itertools
+import os
 import sys
+import threading
+import time
+from pathlib import Path
+
 import numpy as np
+import pandas as pd
 from PySide6.QtWidgets import (
     QApplication,
     QWidget,
@@ -9,11 +16,94 @@ from PySide6.QtWidgets import (
     QSlider,
     QLineEdit,
     QCheckBox,
+    QComboBox,
+    QSpinBox,
+    QTabWidget,
+    QPushButton,
+    QProgressBar,
 )
-from PySide6.QtCore import Qt, QTimer
+from PySide6.QtCore import Qt, QTimer, QObject, QThread, Signal, Slot
 from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
+from matplotlib.backends.backend_qtagg import NavigationToolbar2QT as NavigationToolbar
 from matplotlib.figure import Figure
 
+from lol_matchups_test import (
+    RAW_PATH,
+    flatten_match_lines,
+    keep_complete_matches,
+    compute_lane_matchups,
+    merge_matchups,
+    save_build_outputs,
+)
+
+ROLES = ["top", "jungle", "mid", "bot", "sup"]
+# 与 data_base_riot.py 的 --region / --platform / --queue 选项对应
+REGIONS = ["europe", "americas", "asia", "sea"]
+PLATFORMS = ["euw1", "eun1", "tr1", "ru", "na1", "br1", "la1", "la2", "kr", "jp1", "oc1"]
+QUEUES = [("SoloQ (420)", 420), ("Flex (440)", 440), ("Toutes (0)", 0)]
+
+
+# ---------- 细节层级 (LOD)：min/max 抽稀 ----------
+class MinMaxLOD:
+    """
+    大序列的 min/max 金字塔。第 k 层把原始数据按 2**k 个点分块，保存每块的最小/最大值。
+    查询时挑一层，使可见范围内的块数落在 [n_cols, 2*n_cols) 之间，
+    再合并成 n_cols 个像素列，每列输出 (min, max) 两个点：
+    视觉极值不会丢失，而且重绘开销只与像素宽度有关，与序列长度无关。
+    x 必须单调递增。
+    """
+
+    def __init__(self, x, y):
+        self.x = np.asarray(x, dtype=float)
+        self.y = np.asarray(y, dtype=float)
+        # levels[k] = (块起点的 x, 块最小值, 块最大值)，第 0 层就是原始数据
+        self.levels = [(self.x, self.y, self.y)]
+        xs, lo, hi = self.x, self.y, self.y
+        while len(lo) > 1:
+            if len(lo) % 2:
+                # 奇数长度：重复最后一个元素，不改变 min/max
+                lo = np.append(lo, lo[-1])
+                hi = np.append(hi, hi[-1])
+            lo = lo.reshape(-1, 2).min(axis=1)
+            hi = hi.reshape(-1, 2).max(axis=1)
+            xs = xs[::2]
+            self.levels.append((xs, lo, hi))
+
+    def __len__(self):
+        return len(self.x)
+
+    def y_range(self):
+        """整体的 (min, max)，直接取金字塔顶层。"""
+        _, lo, hi = self.levels[-1]
+        return float(lo[0]), float(hi[0])
+
+    def query(self, x_min, x_max, n_cols):
+        """返回可见区间 [x_min, x_max] 内约 2*n_cols 个点的 (x, y)。"""
+        n_cols = max(int(n_cols), 1)
+        # 两边各多取一个点，保证线段能画到坐标轴边缘
+        i0 = max(int(np.searchsorted(self.x, x_min, side="left")) - 1, 0)
+        i1 = min(int(np.searchsorted(self.x, x_max, side="right")) + 1, len(self.x))
+        count = i1 - i0
+        if count <= 2 * n_cols:
+            return self.x[i0:i1], self.y[i0:i1]
+
+        # 选层：每块 2**k 个点，块数 ≈ count / 2**k，落在 [n_cols, 2*n_cols)
+        k = min(int(np.log2(count / n_cols)), len(self.levels) - 1)
+        xs, lo, hi = self.levels[k]
+        b0 = i0 >> k
+        b1 = ((i1 - 1) >> k) + 1
+        xs, lo, hi = xs[b0:b1], lo[b0:b1], hi[b0:b1]
+
+        # 把这些块均分成 n_cols 个像素列
+        edges = np.unique(np.linspace(0, len(lo), n_cols + 1, dtype=np.int64)[:-1])
+        col_lo = np.minimum.reduceat(lo, edges)
+        col_hi = np.maximum.reduceat(hi, edges)
+        out_x = np.repeat(xs[edges], 2)
+        out_y = np.empty(2 * len(edges))
+        out_y[0::2] = col_lo
+        out_y[1::2] = col_hi
+        return out_x, out_y
+
 
 class SinusWidget(QWidget):
     def __init__(self):
@@ -31,14 +121,20 @@ class SinusWidget(QWidget):
         self.canvas = FigureCanvas(self.fig)
         self.ax = self.fig.add_subplot()
         self.x = np.linspace(0, 10, 400)
+        self.lod = None
         (self.line,) = self.ax.plot(
             self.x, self.amplitude * np.sin(self.frequency * self.x + self.phase)
         )
         self.ax.set_title("sinus animé")
         self.ax.grid(True)
 
+        # 缩放 / 改变窗口大小时重新抽稀
+        self.ax.callbacks.connect("xlim_changed", lambda ax: self.refresh_lod())
+        self.canvas.mpl_connect("resize_event", lambda event: self.refresh_lod())
+
         # ---------- 界面布局 ----------
         layout = QVBoxLayout(self)
+        layout.addWidget(NavigationToolbar(self.canvas, self))
         layout.addWidget(self.canvas)
 
         # 三个滑块控制 frequency, amplitude, phase
@@ -119,7 +215,30 @@ class SinusWidget(QWidget):
     # ---------- 更新图像 ----------
     def update_plot(self):
         y = self.amplitude * np.sin(self.frequency * self.x + self.phase)
-        self.line.set_ydata(y)
+        self.lod = MinMaxLOD(self.x, y)
+        self.refresh_lod()
+
+    # ---------- 显示任意长序列（例如每局 KDA、胜率） ----------
+    def set_series(self, x, y, title=None):
+        """替换当前曲线。序列可以有几十万个点，显示时按像素宽度抽稀。"""
+        self.x = np.asarray(x, dtype=float)
+        self.lod = MinMaxLOD(self.x, y)
+        if title is not None:
+            self.ax.set_title(title)
+        y_min, y_max = self.lod.y_range()
+        pad = 0.05 * (y_max - y_min) or 1.0
+        self.ax.set_ylim(y_min - pad, y_max + pad)
+        # set_xlim 会触发 xlim_changed -> refresh_lod
+        self.ax.set_xlim(self.x[0], self.x[-1])
+
+    # ---------- 按可见范围抽稀（约每像素列 2 个点） ----------
+    def refresh_lod(self):
+        if self.lod is None:
+            return
+        x_min, x_max = self.ax.get_xlim()
+        n_cols = self.ax.get_window_extent().width
+        x, y = self.lod.query(x_min, x_max, n_cols)
+        self.line.set_data(x, y)
         self.canvas.draw_idle()
 
     # ---------- 动画：自动修改相位 ----------
@@ -145,10 +264,517 @@ class SinusWidget(QWidget):
             self.timer.stop()
 
 
+# ---------- 后台任务：构建 / 采集不阻塞 GUI 线程 ----------
+class Cancelled(Exception):
+    pass
+
+
+class Throttle:
+    """最多每 interval 秒放行一次。"""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.last = 0.0
+
+    def due(self):
+        return time.monotonic() - self.last >= self.interval
+
+    def ready(self, force=False):
+        if force or self.due():
+            self.last = time.monotonic()
+            return True
+        return False
+
+
+class PipelineWorker(QObject):
+    """
+    在 QThread 里运行 build（matches_raw.jsonl -> matchups.csv）或 crawl（collect_dataset）。
+    进度和部分结果通过节流后的信号发回 GUI 线程；cancel() 可在任意线程调用。
+    """
+
+    progress = Signal(dict)  # {"stage", "done", "total", "rate", "eta"}
+    partial = Signal(object)  # 增量聚合 DataFrame（role, champ_ally, champ_enemy, games, wins）
+    finished = Signal(object)  # 完整结果（取消时为 None）
+    failed = Signal(str)
+
+    EMIT_INTERVAL = 0.25  # 信号节流：每秒最多 4 次
+    BUILD_CHUNK_LINES = 2000
+
+    def __init__(self, task, **params):
+        super().__init__()
+        self.task = task
+        self.params = params
+        self.stop_event = threading.Event()
+        self.throttle = Throttle(self.EMIT_INTERVAL)
+        self.pending = []  # 尚未发出的增量聚合
+        self.started_at = 0.0
+        self.stage = task
+        self.done = 0
+        self.total = 0
+
+    def cancel(self):
+        self.stop_event.set()
+
+    def check_cancel(self):
+        if self.stop_event.is_set():
+            raise Cancelled()
+
+    @Slot()
+    def run(self):
+        self.started_at = time.monotonic()
+        try:
+            result = getattr(self, f"run_{self.task}")()
+        except Cancelled:
+            self.flush(self.stage, self.done, self.total, force=True)
+            self.finished.emit(None)
+        except BaseException as e:  # SystemExit 也要发回界面，不能杀掉线程
+            self.failed.emit(f"{type(e).__name__}: {e}")
+        else:
+            self.finished.emit(result)
+
+    # ---------- 节流发送 ----------
+    def flush(self, stage, done, total, force=False):
+        self.done, self.total = done, total
+        if not self.throttle.ready(force):
+            return
+        if self.pending:
+            self.partial.emit(merge_matchups(self.pending))
+            self.pending = []
+        elapsed = max(time.monotonic() - self.started_at, 1e-6)
+        rate = done / elapsed
+        eta = (total - done) / rate if rate > 0 and total else None
+        self.progress.emit(
+            {"stage": stage, "done": done, "total": total, "rate": rate, "eta": eta}
+        )
+
+    # ---------- build：分块读取 JSONL ----------
+    def run_build(self):
+        raw_path = self.params.get("raw_path", RAW_PATH)
+        if not raw_path.exists():
+            raise FileNotFoundError(raw_path)
+        total = raw_path.stat().st_size
+        parts = []
+        done = 0
+        with raw_path.open("rb") as f:
+            while True:
+                self.check_cancel()
+                lines = list(itertools.islice(f, self.BUILD_CHUNK_LINES))
+                if not lines:
+                    break
+                done += sum(len(ln) for ln in lines)
+                df = flatten_match_lines(ln.decode("utf-8", errors="replace") for ln in lines)
+                if not df.empty:
+                    agg = compute_lane_matchups(df, verbose=False, by_patch=True)
+                    parts.append(agg)
+                    self.pending.append(agg)
+                self.flush("build", done, total)
+        self.check_cancel()
+        matchups = save_build_outputs(merge_matchups(parts, by_patch=True))
+        self.flush("build", total, total, force=True)
+        return matchups
+
+    # ---------- crawl：collect_dataset 在后台运行 ----------
+    def run_crawl(self):
+        # 延迟导入：riotwatcher 缺失时只让这个任务失败
+        from data_base_riot import collect_dataset
+
+        target = self.params["target_matches"]
+        rows = []
+
+        def on_match(processed, p_rows):
+            for r in p_rows:
+                rows.append(
+                    {
+                        "matchId": r["matchId"],
+                        "teamId": r["teamId"],
+                        "win": r["teamWin"],
+                        "role": r["role"],
+                        "champ": r["championName"],
+                    }
+                )
+            # 只有到了发送时间才做聚合，避免每个 match 都跑一次 groupby
+            if self.throttle.due():
+                self.emit_rows(rows)
+                self.flush("crawl", processed, target)
+
+        # stop_event 也会唤醒限流 / 退避等待（dev key 下可能长达 120 秒）
+        collect_dataset(on_match=on_match, stop_event=self.stop_event, **self.params)
+        self.emit_rows(rows)
+        self.check_cancel()
+        self.flush("crawl", target, target, force=True)
+        return None
+
+    def emit_rows(self, rows):
+        if not rows:
+            return
+        df = keep_complete_matches(pd.DataFrame(rows))
+        rows.clear()
+        if not df.empty:
+            self.pending.append(compute_lane_matchups(df, verbose=False))
+
+
+# ---------- 对位胜率热力图 ----------
+class MatchupHeatmapWidget(QWidget):
+    """
+    显示 compute_lane_matchups 的 role-vs-role 胜率矩阵（行 = 己方英雄，列 = 敌方英雄）。
+    games / wins 累加在预分配的 numpy 数组里；新的聚合结果到达时只累加数组并标记 dirty，
+    由刷新定时器调用 image.set_data，不重建 figure。
+    """
+
+    REFRESH_MS = 100  # 最多每秒刷新 10 次
+    TAIL_MS = 500  # 轮询 matches_raw.jsonl 新增行的间隔
+    TAIL_MAX_BYTES = 256 * 1024  # 每次最多读取的字节数（积压的旧数据分多次读完，不卡界面）
+    MAX_TICK_LABELS = 40  # 英雄太多时不画刻度文字（170 个标签会拖慢重绘）
+
+    def __init__(self, raw_path=RAW_PATH, capacity=192):
+        super().__init__()
+        self.setWindowTitle("Matchups lane-vs-lane")
+        self.raw_path = raw_path
+        self.raw_offset = 0
+
+        # ---------- 聚合数据 ----------
+        self.champs = []  # 按出现顺序
+        self.champ_index = {}  # 英雄名 -> 数组下标
+        self.games = np.zeros((len(ROLES), capacity, capacity), dtype=np.int64)
+        self.wins = np.zeros_like(self.games)
+        self.order = np.zeros(0, dtype=np.int64)  # 按字母排序后的下标
+        self.dirty = False
+        self.shown_n = -1
+
+        # ---------- Matplotlib 图像 ----------
+        self.fig = Figure()
+        self.canvas = FigureCanvas(self.fig)
+        self.ax = self.fig.add_subplot()
+        self.image = self.ax.imshow(
+            np.full((1, 1), np.nan),
+            cmap="RdYlGn",
+            vmin=0.3,
+            vmax=0.7,
+            interpolation="nearest",
+            aspect="auto",
+        )
+        self.fig.colorbar(self.image, ax=self.ax, label="winrate")
+        self.ax.set_xlabel("ennemi")
+        self.ax.set_ylabel("allié")
+        self.canvas.mpl_connect("motion_notify_event", self.on_hover)
+
+        # ---------- 界面布局 ----------
+        layout = QVBoxLayout(self)
+        controls = QHBoxLayout()
+        controls.addWidget(QLabel("Rôle"))
+        self.role_combo = QComboBox()
+        self.role_combo.addItems(ROLES)
+        self.role_combo.currentIndexChanged.connect(self.mark_dirty)
+        controls.addWidget(self.role_combo)
+
+        controls.addWidget(QLabel("Parties min."))
+        self.min_games_spin = QSpinBox()
+        self.min_games_spin.setRange(1, 10000)
+        self.min_games_spin.setValue(1)
+        self.min_games_spin.valueChanged.connect(self.mark_dirty)
+        controls.addWidget(self.min_games_spin)
+
+        self.follow_checkbox = QCheckBox("Suivre la collecte")
+        self.follow_checkbox.stateChanged.connect(self.toggle_follow)
+        controls.addWidget(self.follow_checkbox)
+        controls.addStretch()
+        layout.addLayout(controls)
+
+        layout.addWidget(self.canvas)
+        self.status_label = QLabel("")
+        layout.addWidget(self.status_label)
+
+        # 后台任务：构建 / 采集 / 取消
+        tasks = QHBoxLayout()
+        self.build_button = QPushButton("Construire")
+        self.build_button.clicked.connect(self.start_build)
+        tasks.addWidget(self.build_button)
+
+        tasks.addWidget(QLabel("Région"))
+        self.region_combo = QComboBox()
+        self.region_combo.addItems(REGIONS)
+        tasks.addWidget(self.region_combo)
+
+        tasks.addWidget(QLabel("Plateforme"))
+        self.platform_combo = QComboBox()
+        self.platform_combo.setEditable(True)  # 允许输入列表外的 shard
+        self.platform_combo.addItems(PLATFORMS)
+        tasks.addWidget(self.platform_combo)
+
+        tasks.addWidget(QLabel("File"))
+        self.queue_combo = QComboBox()
+        for label, queue_id in QUEUES:
+            self.queue_combo.addItem(label, queue_id)
+        tasks.addWidget(self.queue_combo)
+
+        tasks.addWidget(QLabel("Matchs"))
+        self.target_spin = QSpinBox()
+        self.target_spin.setRange(10, 1_000_000)
+        self.target_spin.setValue(1000)
+        tasks.addWidget(self.target_spin)
+        self.crawl_button = QPushButton("Collecter")
+        self.crawl_button.clicked.connect(self.start_crawl)
+        tasks.addWidget(self.crawl_button)
+
+        self.cancel_button = QPushButton("Annuler")
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.clicked.connect(self.cancel_task)
+        tasks.addWidget(self.cancel_button)
+
+        self.progress_bar = QProgressBar()
+        tasks.addWidget(self.progress_bar)
+        self.progress_label = QLabel("")
+        tasks.addWidget(self.progress_label)
+        layout.addLayout(tasks)
+
+        self.thread = None
+        self.worker = None
+        # 退出时先停掉后台任务，否则 QThread 在运行中被销毁会直接 abort
+        QApplication.instance().aboutToQuit.connect(self.shutdown)
+
+        # ---------- 定时器 ----------
+        self.refresh_timer = QTimer()
+        self.refresh_timer.timeout.connect(self.redraw)
+        self.refresh_timer.start(self.REFRESH_MS)
+
+        self.tail_timer = QTimer()
+        self.tail_timer.timeout.connect(self.poll_raw)
+
+    # ---------- 英雄名 -> 下标（必要时扩容） ----------
+    def champ_ids(self, names):
+        for name in unique_in_order(names):
+            if name not in self.champ_index:
+                self.champ_index[name] = len(self.champs)
+                self.champs.append(name)
+        capacity = self.games.shape[1]
+        if len(self.champs) > capacity:
+            grow = max(capacity, len(self.champs) - capacity)
+            pad = ((0, 0), (0, grow), (0, grow))
+            self.games = np.pad(self.games, pad)
+            self.wins = np.pad(self.wins, pad)
+        return np.fromiter(
+            (self.champ_index[n] for n in names), dtype=np.int64, count=len(names)
+        )
+
+    # ---------- 接收聚合结果 ----------
+    def add_matchups(self, df):
+        """累加一批增量聚合（列：role, champ_ally, champ_enemy, games, wins）。"""
+        df = df[df["role"].isin(ROLES)]
+        if df.empty:
+            return
+        r = df["role"].map(ROLES.index).to_numpy()
+        a = self.champ_ids(df["champ_ally"].tolist())
+        e = self.champ_ids(df["champ_enemy"].tolist())
+        np.add.at(self.games, (r, a, e), df["games"].to_numpy())
+        np.add.at(self.wins, (r, a, e), df["wins"].to_numpy())
+        self.mark_dirty()
+
+    def set_matchups(self, df):
+        """用一份完整的聚合结果替换当前数据。"""
+        self.games[:] = 0
+        self.wins[:] = 0
+        self.add_matchups(df)
+        self.mark_dirty()
+
+    def mark_dirty(self, *args):
+        self.dirty = True
+
+    # ---------- 刷新：只替换图像数组 ----------
+    def redraw(self):
+        if not self.dirty:
+            return
+        self.dirty = False
+
+        n = len(self.champs)
+        if n != self.shown_n:
+            self.order = np.argsort(np.array(self.champs, dtype=object), kind="stable")
+            size = max(n, 1)
+            self.image.set_extent((-0.5, size - 0.5, size - 0.5, -0.5))
+            self.ax.set_xlim(-0.5, size - 0.5)
+            self.ax.set_ylim(size - 0.5, -0.5)
+            labels = [self.champs[i] for i in self.order]
+            if n <= self.MAX_TICK_LABELS:
+                self.ax.set_xticks(range(n), labels, rotation=90, fontsize=7)
+                self.ax.set_yticks(range(n), labels, fontsize=7)
+            else:
+                self.ax.set_xticks([])
+                self.ax.set_yticks([])
+            self.shown_n = n
+
+        self.image.set_data(self.winrate_matrix())
+        total = int(self.games[self.role_combo.currentIndex()].sum())
+        self.status_label.setText(f"{n} champions, {total} duels")
+        self.canvas.draw_idle()
+
+    def winrate_matrix(self):
+        """当前角色的胜率矩阵（按字母排序），场数不足的格子为 NaN。"""
+        n = len(self.champs)
+        role = self.role_combo.currentIndex()
+        idx = np.ix_(self.order, self.order)
+        g = self.games[role, :n, :n][idx]
+        w = self.wins[role, :n, :n][idx]
+        wr = np.full(g.shape, np.nan)
+        np.divide(w, g, out=wr, where=g >= self.min_games_spin.value())
+        return wr
+
+    # ---------- 鼠标悬停：显示对位详情 ----------
+    def on_hover(self, event):
+        if event.inaxes is not self.ax or event.xdata is None:
+            return
+        n = len(self.champs)
+        i, j = int(round(event.ydata)), int(round(event.xdata))
+        if not (0 <= i < n and 0 <= j < n):
+            return
+        a, e = self.order[i], self.order[j]
+        role = self.role_combo.currentIndex()
+        g = self.games[role, a, e]
+        w = self.wins[role, a, e]
+        wr = f"{w / g:.1%}" if g else "-"
+        self.status_label.setText(
+            f"{ROLES[role]}: {self.champs[a]} vs {self.champs[e]} -> {wr} ({g} parties)"
+        )
+
+    # ---------- 跟踪 matches_raw.jsonl（只读取新增的行） ----------
+    def toggle_follow(self, state):
+        if state:
+            self.tail_timer.start(self.TAIL_MS)
+            self.poll_raw()
+        else:
+            self.tail_timer.stop()
+
+    def poll_raw(self):
+        path = self.raw_path
+        if not path.exists():
+            return
+        size = path.stat().st_size
+        if size < self.raw_offset:
+            # 文件被重写（例如 --demo）：从头开始
+            self.raw_offset = 0
+            self.games[:] = 0
+            self.wins[:] = 0
+        if size == self.raw_offset:
+            return
+        with path.open("rb") as f:
+            f.seek(self.raw_offset)
+            chunk = f.read(min(size - self.raw_offset, self.TAIL_MAX_BYTES))
+            if b"\n" not in chunk and self.raw_offset + len(chunk) < size:
+                chunk += f.readline()  # 单行超过上限：读完这一行
+        # 只处理完整的行，写了一半的行留到下次
+        end = chunk.rfind(b"\n") + 1
+        if end == 0:
+            return
+        self.raw_offset += end
+        lines = chunk[:end].decode("utf-8", errors="replace").splitlines()
+        df = flatten_match_lines(lines)
+        if not df.empty:
+            self.add_matchups(compute_lane_matchups(df, verbose=False))
+        # 还有积压：下一次事件循环立即继续（中间仍会处理界面事件），否则恢复正常间隔
+        if self.tail_timer.isActive():
+            self.tail_timer.start(0 if self.raw_offset < size else self.TAIL_MS)
+
+
+    # ---------- 后台任务 ----------
+    def start_build(self):
+        # build 会重新读取整个 JSONL，先停止跟踪以免重复计数
+        self.follow_checkbox.setChecked(False)
+        self.set_matchups(pd.DataFrame(columns=["role", "champ_ally", "champ_enemy", "games", "wins"]))
+        self.start_task("build", raw_path=self.raw_path)
+
+    def start_crawl(self):
+        api_key = os.getenv("RIOT_API_KEY")
+        if not api_key:
+            self.progress_label.setText("RIOT_API_KEY absente")
+            return
+        self.start_task(
+            "crawl",
+            api_key=api_key,
+            region=self.region_combo.currentText(),
+            platform=self.platform_combo.currentText().lower().strip(),
+            target_matches=self.target_spin.value(),
+            queue_id=self.queue_combo.currentData() or None,  # 0 = 所有队列（与 CLI 相同）
+            outdir=Path("data_db"),
+        )
+
+    def start_task(self, task, **params):
+        if self.thread is not None:
+            return
+        self.thread = QThread()
+        self.worker = PipelineWorker(task, **params)
+        self.worker.moveToThread(self.thread)
+        self.thread.started.connect(self.worker.run)
+        self.worker.progress.connect(self.on_progress)
+        self.worker.partial.connect(self.add_matchups)
+        self.worker.finished.connect(self.on_task_finished)
+        self.worker.failed.connect(self.on_task_failed)
+        self.worker.finished.connect(self.thread.quit)
+        self.worker.failed.connect(self.thread.quit)
+        self.thread.finished.connect(self.on_thread_finished)
+
+        self.build_button.setEnabled(False)
+        self.crawl_button.setEnabled(False)
+        self.cancel_button.setEnabled(True)
+        self.progress_bar.setValue(0)
+        self.progress_label.setText(f"{task}…")
+        self.thread.start()
+
+    def cancel_task(self):
+        if self.worker is not None:
+            self.worker.cancel()
+            self.progress_label.setText("annulation…")
+
+    def shutdown(self):
+        """程序退出前：取消任务并等待线程结束。"""
+        if self.thread is None:
+            return
+        self.worker.cancel()
+        self.thread.quit()
+        self.thread.wait()
+
+    def on_progress(self, info):
+        total = info["total"] or 1
+        self.progress_bar.setValue(int(100 * info["done"] / total))
+        eta = info["eta"]
+        eta_txt = f", ETA {eta:.0f}s" if eta is not None else ""
+        unit = "o/s" if info["stage"] == "build" else "matchs/s"
+        self.progress_label.setText(
+            f"{info['stage']}: {info['done']}/{info['total']} ({info['rate']:.1f} {unit}{eta_txt})"
+        )
+
+    def on_task_finished(self, result):
+        if result is None:
+            self.progress_label.setText(
+                "annulé" if self.worker.stop_event.is_set() else "terminé"
+            )
+            return
+        # build : remplace les agrégats partiels par le résultat exact
+        self.set_matchups(result)
+        self.progress_label.setText(f"terminé: {len(result)} paires")
+
+    def on_task_failed(self, message):
+        self.progress_label.setText(f"erreur: {message}")
+
+    def on_thread_finished(self):
+        self.worker.deleteLater()
+        self.thread.deleteLater()
+        self.worker = None
+        self.thread = None
+        self.build_button.setEnabled(True)
+        self.crawl_button.setEnabled(True)
+        self.cancel_button.setEnabled(False)
+
+
+def unique_in_order(values):
+    """保持顺序去重。"""
+    return list(dict.fromkeys(values))
+
+
 # ---------- 主程序 ----------
 if __name__ == "__main__":
     app = QApplication(sys.argv)
-    win = SinusWidget()
-    win.resize(700, 500)
+    win = QTabWidget()
+    win.setWindowTitle("superLOLassistant")
+    win.addTab(MatchupHeatmapWidget(), "Matchups")
+    win.addTab(SinusWidget(), "Sinus")
+    win.resize(900, 700)
     win.show()
     sys.exit(app.exec())
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Statistiques de matchups approchées, en mémoire fixe (mode --approx de lol_matchups_test.py).
+
+- count-min sketch (profondeur d x largeur w) pour games et wins par paire (role, allié, ennemi) :
+  une estimation ne sous-estime jamais, et dépasse la vraie valeur de plus de eps*N
+  (eps = e/w, N = duels vus) avec une probabilité <= exp(-d)
+- heavy hitters (Misra-Gries, k compteurs) : les matchups les plus joués, à N/(k+1) près
+- fusionnable : deux sketches de mêmes dimensions s'additionnent (shards, processus, machines)
+
+USAGE
+-----
+# fusion des sketches calculés par plusieurs processus
+python matchup_sketch.py --merge shard1.npz shard2.npz --out data/matchups_sketch.npz
+
+# matchups les plus joués
+python matchup_sketch.py --top 20 --sketch data/matchups_sketch.npz
+"""
+
+from __future__ import annotations
+import argparse
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+import numpy as np
+import pandas as pd
+
+KEY_COLUMNS = ["role", "champ_ally", "champ_enemy"]
+HASH_KEY = "lolmatchupsketch"   # 16 caractères, fixe : les hachages sont identiques d'un processus à l'autre
+
+DEFAULT_WIDTH = 1 << 17         # eps = e / w ~ 2.1e-5
+DEFAULT_DEPTH = 4               # confiance 1 - exp(-4) ~ 98 %
+DEFAULT_HEAVY = 1024            # compteurs Misra-Gries
+
+
+def hash_keys(keys: pd.DataFrame) -> np.ndarray:
+    """uint64 par ligne (role, champ_ally, champ_enemy), stable entre processus."""
+    return pd.util.hash_pandas_object(keys[KEY_COLUMNS], index=False, hash_key=HASH_KEY).to_numpy()
+
+
+class MatchupSketch:
+    def __init__(self, width: int = DEFAULT_WIDTH, depth: int = DEFAULT_DEPTH, heavy_hitters: int = DEFAULT_HEAVY):
+        self.width = int(width); self.depth = int(depth); self.heavy_hitters = int(heavy_hitters)
+        self.games = np.zeros((self.depth, self.width), dtype=np.int64)
+        self.wins = np.zeros((self.depth, self.width), dtype=np.int64)
+        self.n = 0                                          # duels vus (N)
+        self.hh: Dict[Tuple[str, str, str], int] = {}       # Misra-Gries
+        self.champs: set = set()                            # vocabulaire pour les requêtes par ennemi
+
+    # --------- Positions ----------
+    def cells(self, keys: pd.DataFrame) -> np.ndarray:
+        """
+        [depth, n] : colonne de chaque clé dans chaque ligne. Double hachage
+        h1 + i*h2 (Kirsch-Mitzenmacher) à partir d'un seul hachage 64 bits.
+        """
+        h = hash_keys(keys)
+        h1 = h & np.uint64(0xFFFFFFFF)
+        h2 = (h >> np.uint64(32)) | np.uint64(1)
+        rows = np.arange(self.depth, dtype=np.uint64)[:, None]
+        return ((h1[None, :] + rows * h2[None, :]) % np.uint64(self.width)).astype(np.int64)
+
+    # --------- Mise à jour ----------
+    def add_duels(self, duels: pd.DataFrame) -> None:
+        """duels : colonnes role, champ_ally, champ_enemy, ally_win (voir lane_duels)."""
+        if duels.empty:
+            return
+        agg = duels.groupby(KEY_COLUMNS, sort=False)["ally_win"].agg(["size", "sum"]).reset_index()
+        self.add_counts(agg[KEY_COLUMNS], agg["size"].to_numpy(), agg["sum"].to_numpy())
+
+    def add_counts(self, keys: pd.DataFrame, games: np.ndarray, wins: np.ndarray) -> None:
+        cells = self.cells(keys)
+        for i in range(self.depth):
+            self.games[i] += np.bincount(cells[i], weights=games, minlength=self.width).astype(np.int64)
+            self.wins[i] += np.bincount(cells[i], weights=wins, minlength=self.width).astype(np.int64)
+        self.n += int(games.sum())
+        self.champs.update(keys["champ_ally"]); self.champs.update(keys["champ_enemy"])
+        self.update_heavy(zip(map(tuple, keys[KEY_COLUMNS].to_numpy()), games.tolist()))
+
+    def update_heavy(self, items: Iterable[Tuple[Tuple[str, str, str], int]]) -> None:
+        """
+        Misra-Gries pondéré : on additionne, puis s'il y a plus de k compteurs on retire
+        à tous la (k+1)-ième valeur. Même règle pour fusionner deux résumés.
+        """
+        for key, c in items:
+            self.hh[key] = self.hh.get(key, 0) + int(c)
+        if len(self.hh) > self.heavy_hitters:
+            cut = sorted(self.hh.values(), reverse=True)[self.heavy_hitters]
+            self.hh = {k: v - cut for k, v in self.hh.items() if v > cut}
+
+    def merge(self, other: "MatchupSketch") -> "MatchupSketch":
+        if (self.width, self.depth) != (other.width, other.depth):
+            raise ValueError(f"Sketches incompatibles: {self.depth}x{self.width} vs {other.depth}x{other.width}")
+        self.games += other.games; self.wins += other.wins; self.n += other.n
+        self.champs |= other.champs
+        self.heavy_hitters = min(self.heavy_hitters, other.heavy_hitters)
+        self.update_heavy(other.hh.items())
+        return self
+
+    # --------- Requêtes ----------
+    @property
+    def error(self) -> float:
+        """Surestimation max de games/wins (eps*N), valable avec probabilité self.confidence."""
+        return np.e / self.width * self.n
+
+    @property
+    def confidence(self) -> float:
+        return 1.0 - np.exp(-self.depth)
+
+    def estimate(self, keys: pd.DataFrame) -> pd.DataFrame:
+        """
+        games/wins estimés + bornes : vrai games dans [games - err, games], idem wins ;
+        winrate_low/high encadrent le vrai winrate avec la même confiance.
+        """
+        out = keys[KEY_COLUMNS].reset_index(drop=True).copy()
+        if out.empty:
+            return out.assign(games=0, wins=0, winrate=0.0, err=0.0, winrate_low=0.0, winrate_high=1.0)
+        cells = self.cells(out)
+        rows = np.arange(self.depth)[:, None]
+        games = self.games[rows, cells].min(axis=0)
+        wins = np.minimum(self.wins[rows, cells].min(axis=0), games)
+        err = self.error
+        out["games"] = games; out["wins"] = wins
+        out["winrate"] = wins / np.maximum(games, 1)
+        out["err"] = err
+        out["winrate_low"] = np.clip((wins - err) / np.maximum(games, 1), 0.0, 1.0)
+        out["winrate_high"] = np.clip(wins / np.maximum(games - err, 1), 0.0, 1.0)
+        return out
+
+    def versus(self, role: str, enemy: str) -> pd.DataFrame:
+        """Tous les alliés connus contre `enemy` dans `role`."""
+        allies = sorted(self.champs)
+        return self.estimate(pd.DataFrame({"role": role, "champ_ally": allies, "champ_enemy": enemy}))
+
+    def top_matchups(self, n: int = 20) -> pd.DataFrame:
+        """Heavy hitters, classés par nombre de parties estimé."""
+        if not self.hh:
+            return self.estimate(pd.DataFrame(columns=KEY_COLUMNS))
+        keys = pd.DataFrame(list(self.hh), columns=KEY_COLUMNS)
+        return self.estimate(keys).sort_values("games", ascending=False).head(n)
+
+    # --------- Persistance ----------
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        hh_keys = np.array(list(self.hh), dtype=str).reshape(-1, 3)
+        np.savez_compressed(path, games=self.games, wins=self.wins,
+                            meta=np.array([self.width, self.depth, self.heavy_hitters, self.n], dtype=np.int64),
+                            hh_keys=hh_keys, hh_counts=np.array(list(self.hh.values()), dtype=np.int64),
+                            champs=np.array(sorted(self.champs), dtype=str))
+
+    @classmethod
+    def load(cls, path: Path) -> "MatchupSketch":
+        if not path.exists():
+            raise SystemExit(f"{path} introuvable. Lance d'abord --participants ... --approx.")
+        with np.load(path) as z:
+            width, depth, heavy, n = (int(x) for x in z["meta"])
+            sk = cls(width=width, depth=depth, heavy_hitters=heavy)
+            sk.games = z["games"]; sk.wins = z["wins"]; sk.n = n
+            sk.hh = {tuple(k): int(c) for k, c in zip(z["hh_keys"].tolist(), z["hh_counts"].tolist())}
+            sk.champs = set(z["champs"].tolist())
+        return sk
+
+    def describe(self) -> str:
+        mb = (self.games.nbytes + self.wins.nbytes) / 2**20
+        return (f"{self.depth}x{self.width} ({mb:.1f} Mo), N={self.n} duels, "
+                f"erreur <= {self.error:.1f} parties à {100 * self.confidence:.0f} %")
+
+
+def merge_files(paths: List[Path]) -> MatchupSketch:
+    sketch = MatchupSketch.load(paths[0])
+    for p in paths[1:]:
+        sketch.merge(MatchupSketch.load(p))
+    return sketch
+
+
+# ===============================
+#               CLI
+# ===============================
+def main():
+    ap = argparse.ArgumentParser(description="Sketches de matchups (fusion de shards, heavy hitters)")
+    ap.add_argument("--sketch", type=str, default="data/matchups_sketch.npz", help="Sketch à lire (--top)")
+    ap.add_argument("--merge", type=str, nargs="+", metavar="NPZ", help="Sketches à fusionner (mêmes dimensions)")
+    ap.add_argument("--out", type=str, default="data/matchups_sketch.npz", help="Sortie de --merge")
+    ap.add_argument("--top", type=int, default=20, help="Nb de matchups les plus joués à afficher")
+    args = ap.parse_args()
+
+    if args.merge:
+        sketch = merge_files([Path(p) for p in args.merge])
+        sketch.save(Path(args.out))
+        print(f"[SKETCH] {len(args.merge)} sketches fusionnés -> {Path(args.out).resolve()}")
+    else:
+        sketch = MatchupSketch.load(Path(args.sketch))
+    print(f"[SKETCH] {sketch.describe()}")
+    print(sketch.top_matchups(args.top).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
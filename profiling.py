@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Profilage optionnel des pipelines (--profile / --profile-out), sans toucher au code métier.
+
+- profiling.stage("merge") : span de temps + pic mémoire tracemalloc de l'étape
+  (no-op tant que enable() n'a pas été appelé)
+- --profile-out DIR : profile.pstats (cProfile, pour snakeviz / pstats) et
+  stacks.collapsed (échantillonnage de la pile, format flamegraph.pl / speedscope)
+
+Les étapes peuvent s'imbriquer : les temps sont inclusifs, le pic d'une étape
+parente tient compte des pics de ses enfants.
+"""
+
+from __future__ import annotations
+import cProfile, collections, sys, threading, time, tracemalloc
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Dict, List
+
+
+class StackSampler(threading.Thread):
+    """Échantillonne la pile d'un thread toutes les `interval` s -> piles « collapsed »."""
+
+    def __init__(self, thread_id: int, profiler: "StageProfiler", interval: float = 0.005):
+        super().__init__(name="stack-sampler", daemon=True)
+        self.thread_id = thread_id; self.profiler = profiler; self.interval = interval
+        self.counts: collections.Counter = collections.Counter()
+        self.halt = threading.Event()
+
+    def run(self) -> None:
+        while not self.halt.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None: continue
+            names: List[str] = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{Path(code.co_filename).name}:{code.co_name}")
+                frame = frame.f_back
+            stages = [f"[{s}]" for s in self.profiler.stack_names()]
+            self.counts[";".join(stages + names[::-1])] += 1
+
+    def write(self, path: Path) -> None:
+        with path.open("w", encoding="utf-8") as f:
+            for stack, n in self.counts.most_common():
+                f.write(f"{stack} {n}\n")
+
+
+class StageProfiler:
+    def __init__(self, out_dir: Path | None = None, sample_interval: float = 0.005):
+        self.out_dir = out_dir
+        self.totals: Dict[str, List[float]] = {}   # nom -> [appels, secondes, pic octets]
+        self.order: List[str] = []
+        self.stack: List[list] = []                # [nom, pic courant des enfants]
+        self.lock = threading.Lock()
+        self.cprofile = cProfile.Profile() if out_dir else None
+        self.sampler = StackSampler(threading.get_ident(), self, sample_interval) if out_dir else None
+        self.t0 = 0.0
+
+    def stack_names(self) -> List[str]:
+        return [s[0] for s in list(self.stack)]
+
+    def start(self) -> None:
+        if not tracemalloc.is_tracing(): tracemalloc.start()
+        self.t0 = time.perf_counter()
+        if self.cprofile: self.cprofile.enable()
+        if self.sampler: self.sampler.start()
+
+    @contextmanager
+    def stage(self, name: str):
+        # le pic global va être remis à zéro : on le reporte d'abord sur l'étape parente
+        if self.stack:
+            self.stack[-1][1] = max(self.stack[-1][1], tracemalloc.get_traced_memory()[1])
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        entry = [name, 0]
+        self.stack.append(entry)
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            dt = time.perf_counter() - t
+            self.stack.pop()
+            peak = max(tracemalloc.get_traced_memory()[1], entry[1])
+            if self.stack:
+                self.stack[-1][1] = max(self.stack[-1][1], peak)
+            with self.lock:
+                if name not in self.totals:
+                    self.totals[name] = [0, 0.0, 0]; self.order.append(name)
+                tot = self.totals[name]
+                tot[0] += 1; tot[1] += dt; tot[2] = max(tot[2], peak - base)
+
+    def finish(self) -> None:
+        wall = time.perf_counter() - self.t0
+        if self.cprofile: self.cprofile.disable()
+        if self.sampler:
+            self.sampler.halt.set(); self.sampler.join()
+        _, peak_total = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        print("\n[PROFILE] étape           appels    total (s)   moyen (ms)   % mur   pic mém. (Mo)")
+        for name in self.order:
+            n, sec, peak = self.totals[name]
+            print(f"[PROFILE] {name:<15} {int(n):>6} {sec:>12.3f} {1000 * sec / n:>12.3f} "
+                  f"{100 * sec / wall if wall else 0:>7.1f} {peak / 2**20:>15.1f}")
+        print(f"[PROFILE] total mur: {wall:.3f} s (temps inclusifs, étapes imbriquées possibles)")
+
+        if self.out_dir:
+            self.out_dir.mkdir(parents=True, exist_ok=True)
+            pstats_path = self.out_dir / "profile.pstats"
+            collapsed_path = self.out_dir / "stacks.collapsed"
+            self.cprofile.dump_stats(pstats_path)
+            self.sampler.write(collapsed_path)
+            print(f"[PROFILE] cProfile  -> {pstats_path.resolve()}  (python -m pstats / snakeviz)")
+            print(f"[PROFILE] piles     -> {collapsed_path.resolve()}  (flamegraph.pl / speedscope)")
+
+
+_ACTIVE: StageProfiler | None = None
+
+
+def enable(out_dir: str | Path | None = None) -> StageProfiler:
+    global _ACTIVE
+    _ACTIVE = StageProfiler(Path(out_dir) if out_dir else None)
+    _ACTIVE.start()
+    return _ACTIVE
+
+
+def finish() -> None:
+    global _ACTIVE
+    if _ACTIVE is not None:
+        _ACTIVE.finish()
+        _ACTIVE = None
+
+
+def stage(name: str):
+    """Span nommé ; ne coûte presque rien quand le profilage est désactivé."""
+    return _ACTIVE.stage(name) if _ACTIVE is not None else nullcontext()
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pool de clés API Riot (--api-keys-file), partagé par les deux collecteurs.
+
+- budget indépendant par clé : fenêtres glissantes, comme l'app rate limit Riot (clé dev : 20:1,100:120)
+- chaque appel part sur la clé la moins chargée qui a encore du budget
+- 401/403 : la clé est retirée du pool et l'appel repart sur une autre ;
+  SystemExit seulement quand il n'en reste plus aucune
+- 429 sur une clé : elle est mise en pause (Retry-After) et l'appel repart sur une autre
+
+pool.lol() / pool.riot() imitent LolWatcher / RiotWatcher (lol.match.by_id(...)) :
+les sites d'appel et safe_call ne changent pas. Le pool est thread-safe : data_base_riot.py
+télécharge les matchs avec len(pool) workers, le débit suit donc le nombre de clés.
+
+riot_base_url(url) redirige riotwatcher vers un autre serveur (riot_mock_server.py) le temps d'une
+collecte, puis restaure l'URL d'origine.
+
+ATTENTION : PUUID et summonerId sont chiffrés par application. Les clés d'un même pool doivent
+appartenir à la même application, sinon un PUUID obtenu avec une clé est refusé (400) par les
+autres. Les matchIds ne sont pas chiffrés.
+"""
+
+from __future__ import annotations
+import collections, contextlib, os, threading, time
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Iterator, List, Set, Tuple
+
+from riot_retry import classify, retry_after
+
+DEV_KEY_LIMITS = "20:1,100:120"
+
+
+def parse_limits(spec: str) -> List[Tuple[int, float]]:
+    """'20:1,100:120' -> [(20, 1.0), (100, 120.0)]"""
+    out = []
+    for part in spec.split(","):
+        if part.strip():
+            n, w = part.split(":"); out.append((int(n), float(w)))
+    return out
+
+def load_keys(path: Path) -> List[str]:
+    """Une clé par ligne ; lignes vides et commentaires (#) ignorés, doublons retirés."""
+    if not path.exists():
+        raise SystemExit(f"{path} introuvable (--api-keys-file).")
+    with open(path, "r", encoding="utf-8") as f:
+        keys = [ln.split("#", 1)[0].strip() for ln in f]
+    keys = list(dict.fromkeys(k for k in keys if k))
+    if not keys:
+        raise SystemExit(f"Aucune clé dans {path}.")
+    return keys
+
+def mask(key: str) -> str:
+    return f"{key[:9]}…{key[-4:]}" if len(key) > 16 else key
+
+@contextlib.contextmanager
+def riot_base_url(base_url: str | None = None) -> Iterator[None]:
+    """
+    Redirige riotwatcher vers base_url (défaut : $RIOT_BASE_URL, ex: http://127.0.0.1:8765)
+    pendant le bloc, puis restaure l'URL d'origine. UrlConfig est global au processus, et
+    LolWatcher() le réinitialise : entrer dans le bloc APRÈS la création des watchers.
+    """
+    base_url = base_url or os.getenv("RIOT_BASE_URL")
+    if not base_url:
+        yield; return
+    from riotwatcher._apis import UrlConfig
+    saved = (UrlConfig.root_url, UrlConfig.riot_url)
+    UrlConfig.root_url = UrlConfig.riot_url = base_url.rstrip("/") + "/{platform}"
+    try:
+        yield
+    finally:
+        UrlConfig.root_url, UrlConfig.riot_url = saved
+
+
+# --------- Budget d'une clé ----------
+class KeyBudget:
+    """Fenêtres glissantes (n appels / w secondes) d'une clé."""
+
+    def __init__(self, limits: List[Tuple[int, float]]):
+        self.limits = limits
+        self.horizon = max((w for _, w in limits), default=0.0)
+        self.hits: Deque[float] = collections.deque()
+
+    def prune(self, now: float) -> None:
+        while self.hits and now - self.hits[0] >= self.horizon: self.hits.popleft()
+
+    def wait(self, now: float) -> float:
+        """Secondes avant qu'un appel de plus tienne dans toutes les fenêtres (0 = tout de suite)."""
+        self.prune(now)
+        wait = 0.0
+        for n, w in self.limits:
+            inside = [t for t in self.hits if now - t < w]
+            if len(inside) >= n:
+                wait = max(wait, inside[len(inside) - n] + w - now)
+        return wait
+
+    def load(self, now: float) -> float:
+        """Fraction du budget consommée dans la fenêtre la plus chargée."""
+        self.prune(now)
+        return max((sum(1 for t in self.hits if now - t < w) / n for n, w in self.limits), default=0.0)
+
+    def record(self, now: float) -> None:
+        self.hits.append(now)
+
+
+class PooledKey:
+    def __init__(self, key: str, budget: KeyBudget, watchers: Dict[str, Any]):
+        self.key = key; self.budget = budget; self.watchers = watchers
+        self.calls = 0; self.paused_until = 0.0
+
+
+def riotwatcher_factory(key: str) -> Dict[str, Any]:
+    from riotwatcher import LolWatcher, RiotWatcher
+    from riotwatcher.Handlers.RateLimit import BasicRateLimiter
+    # un limiteur riotwatcher par clé : l'instance par défaut est partagée par tous les watchers
+    return {"lol": LolWatcher(key, rate_limiter=BasicRateLimiter()),
+            "riot": RiotWatcher(key, rate_limiter=BasicRateLimiter())}
+
+
+# --------- Pool ----------
+class KeyPool:
+    def __init__(self, keys: List[str], limits: str = DEV_KEY_LIMITS,
+                 make_watchers: Callable[[str], Dict[str, Any]] | None = None,
+                 sleep: Callable[[float], None] = time.sleep, clock: Callable[[], float] = time.monotonic):
+        keys = list(dict.fromkeys(k for k in keys if k))
+        if not keys:
+            raise SystemExit("Aucune clé API (--api-key, RIOT_API_KEY ou --api-keys-file).")
+        make = make_watchers or riotwatcher_factory
+        self.keys = [PooledKey(k, KeyBudget(parse_limits(limits)), make(k)) for k in keys]
+        self.template = self.keys[0].watchers   # introspection des endpoints (même si la clé est retirée)
+        self.evicted: Dict[str, str] = {}
+        self.sleep = sleep; self.clock = clock
+        self.lock = threading.Lock()
+        self.stats: Dict[str, int] = {"waits": 0, "rerouted_429": 0}
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def lol(self) -> "PooledWatcher":
+        return PooledWatcher(self, "lol")
+
+    def riot(self) -> "PooledWatcher":
+        return PooledWatcher(self, "riot")
+
+    def acquire(self) -> PooledKey:
+        """Clé la moins chargée parmi celles qui ont du budget ; sinon attend la première libre."""
+        while True:
+            with self.lock:
+                if not self.keys:
+                    raise SystemExit("Plus aucune clé API valide (401/403 sur toutes les clés du pool).")
+                now = self.clock()
+                ready = [k for k in self.keys if k.paused_until <= now and k.budget.wait(now) == 0]
+                if ready:
+                    k = min(ready, key=lambda k: (k.budget.load(now), k.calls))
+                    k.budget.record(now); k.calls += 1
+                    return k
+                delay = min(max(k.paused_until - now, k.budget.wait(now)) for k in self.keys)
+                self.stats["waits"] += 1
+            self.sleep(delay)
+
+    def evict(self, k: PooledKey, err: BaseException) -> None:
+        with self.lock:
+            if k in self.keys:
+                self.keys.remove(k)
+                self.evicted[k.key] = str(err)
+                print(f"[KEYS] Clé {mask(k.key)} retirée (401/403), {len(self.keys)} restante(s).")
+
+    def pause(self, k: PooledKey, seconds: float) -> None:
+        with self.lock:
+            k.paused_until = max(k.paused_until, self.clock() + seconds)
+
+    def call(self, kind: str, endpoint: str, method: str, *args, **kwargs) -> Any:
+        tried: Set[str] = set()   # clés ayant déjà répondu 429 pour cet appel
+        while True:
+            k = self.acquire()
+            fn = getattr(getattr(k.watchers[kind], endpoint), method)
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                cls = classify(e)
+                if cls == "auth":
+                    self.evict(k, e); continue
+                if cls == "rate_limit":
+                    self.pause(k, retry_after(e) or 1.0)
+                    tried.add(k.key)
+                    if any(x.key not in tried for x in self.keys):
+                        self.stats["rerouted_429"] += 1; continue
+                raise   # toutes les clés sont en 429 : backoff du RetryScheduler
+
+    def summary(self) -> str:
+        per_key = ", ".join(f"{mask(k.key)}={k.calls}" for k in self.keys) or "-"
+        return (f"{len(self.keys)} clé(s) active(s), {len(self.evicted)} retirée(s) | appels par clé: {per_key} | "
+                f"attentes budget={self.stats['waits']}, 429 redirigés={self.stats['rerouted_429']}")
+
+
+# --------- Façade riotwatcher ----------
+class PooledWatcher:
+    """pool.lol().match -> PooledEndpoint ; les endpoints sont mis en cache (alias possibles)."""
+
+    def __init__(self, pool: KeyPool, kind: str):
+        self._pool = pool; self._kind = kind; self._endpoints: Dict[str, PooledEndpoint] = {}
+
+    def __getattr__(self, name: str) -> "PooledEndpoint":
+        if name.startswith("_"): raise AttributeError(name)
+        if name not in self._endpoints:
+            api = getattr(self._pool.template[self._kind], name)   # AttributeError si inconnu
+            self._endpoints[name] = PooledEndpoint(self._pool, self._kind, name, type(api).__name__)
+        return self._endpoints[name]
+
+class PooledEndpoint:
+    def __init__(self, pool: KeyPool, kind: str, endpoint: str, api_name: str):
+        self._pool = pool; self._kind = kind; self._endpoint = endpoint; self._api_name = api_name
+
+    def __getattr__(self, name: str) -> "PooledMethod":
+        if name.startswith("_"): raise AttributeError(name)
+        getattr(getattr(self._pool.template[self._kind], self._endpoint), name)   # hasattr() fiable
+        return PooledMethod(self._pool, self._kind, self._endpoint, name, self._api_name)
+
+class PooledMethod:
+    def __init__(self, pool: KeyPool, kind: str, endpoint: str, method: str, api_name: str):
+        self.pool = pool; self.kind = kind; self.endpoint = endpoint; self.method = method
+        self.__name__ = f"{api_name}.{method}"   # nom du circuit breaker (riot_retry.endpoint_name)
+
+    def __call__(self, *args, **kwargs) -> Any:
+        return self.pool.call(self.kind, self.endpoint, self.method, *args, **kwargs)
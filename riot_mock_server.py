@@ -0,0 +1,433 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Serveur local qui imite les endpoints Riot utilisés par les collecteurs
+(league-v4, summoner-v4, account-v1, match-v5) + driver de test de charge.
+
+USAGE EXEMPLES
+--------------
+# 1) Serveur seul (données synthétiques), puis collecte réelle contre lui
+python riot_mock_server.py --port 8765 --latency-ms 30 --p5xx 0.02
+RIOT_BASE_URL=http://127.0.0.1:8765 python data_base_riot.py --api-key RGAPI-MOCK --target 200
+
+# 2) Rejouer des matchs enregistrés
+python riot_mock_server.py --fixtures data/matches_raw.jsonl
+
+# 3) Test de charge : lance le serveur + le vrai crawler, affiche matchs/s, appels/match, budget gaspillé
+python riot_mock_server.py --loadtest --crawler collect --target 300 --rate-limit 500:10 --p429 0.01 --p5xx 0.02
+
+# 4) Pool de clés : débit avec 4 clés, dont une révoquée (403)
+python riot_mock_server.py --loadtest --target 200 --rate-limit 20:1,100:120 --keys 4 --revoke-keys RGAPI-MOCK-2
+"""
+
+from __future__ import annotations
+import argparse, collections, json, random, re, tempfile, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Set, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from riot_keys import parse_limits
+
+ROLE_KEYS = ["TOP", "JUNGLE", "MIDDLE", "BOTTOM", "UTILITY"]
+CHAMPS = ["Ahri","Zed","Yone","Orianna","Annie","Garen","Darius","Jax","Camille","Riven",
+          "LeeSin","Vi","Sejuani","Kayn","Graves","Jinx","Caitlyn","Ashe","Xayah","Ezreal",
+          "Thresh","Lulu","Leona","Nautilus","Morgana","Syndra","Viktor","Akali","Sett","Ornn"]
+
+
+# ===============================
+#        DONNÉES (fixtures)
+# ===============================
+class MockWorld:
+    """Joueurs, ladder, matchlists et matchs servis par le serveur."""
+
+    def __init__(self):
+        self.players: List[Dict[str, str]] = []     # puuid, id (summonerId), gameName, tagLine
+        self.by_puuid: Dict[str, Dict[str, str]] = {}
+        self.by_summoner: Dict[str, Dict[str, str]] = {}
+        self.by_riot_id: Dict[Tuple[str, str], Dict[str, str]] = {}
+        self.matches: Dict[str, bytes] = {}          # matchId -> JSON déjà sérialisé
+        self.match_queue: Dict[str, int] = {}
+        self.matchlists: Dict[str, List[str]] = collections.defaultdict(list)  # plus récent en premier
+
+    def add_player(self, puuid: str) -> Dict[str, str]:
+        if puuid in self.by_puuid: return self.by_puuid[puuid]
+        n = len(self.players)
+        p = {"puuid": puuid, "id": f"SUMM-{n:06d}", "gameName": f"Mock{n}", "tagLine": "MOCK"}
+        self.players.append(p); self.by_puuid[puuid] = p; self.by_summoner[p["id"]] = p
+        self.by_riot_id[(p["gameName"].lower(), p["tagLine"].lower())] = p
+        return p
+
+    def add_match(self, match: Dict[str, Any]) -> None:
+        mid = match["metadata"]["matchId"]
+        self.matches[mid] = json.dumps(match).encode("utf-8")
+        self.match_queue[mid] = match.get("info", {}).get("queueId", 420)
+        for part in match.get("info", {}).get("participants", []):
+            self.add_player(part["puuid"])
+            self.matchlists[part["puuid"]].insert(0, mid)
+
+    def tier(self, name: str) -> List[Dict[str, str]]:
+        """Répartit les 300 premiers joueurs en MASTER / GRANDMASTER / CHALLENGER."""
+        top = self.players[:300]
+        return {"CHALLENGER": top[:50], "GRANDMASTER": top[50:120], "MASTER": top[120:]}.get(name, [])
+
+    @classmethod
+    def synthetic(cls, n_players: int = 2000, n_matches: int = 5000, seed: int = 0,
+                  patches: int = 4) -> "MockWorld":
+        rng = random.Random(seed)
+        world = cls()
+        puuids = [f"PUUID-{i:06d}-" + "x" * 60 for i in range(n_players)]
+        for pu in puuids: world.add_player(pu)
+        for m in range(n_matches):
+            mid = f"EUW1_{7_000_000_000 + m}"
+            players = rng.sample(puuids, 10)
+            blue_win = rng.random() < 0.5
+            patch = f"14.{1 + m * patches // max(n_matches, 1)}"
+            parts = []
+            for i, pu in enumerate(players):
+                team = 100 if i < 5 else 200
+                k, d, a = rng.randint(0, 15), rng.randint(0, 12), rng.randint(0, 20)
+                parts.append({
+                    "puuid": pu, "teamId": team, "win": blue_win == (team == 100),
+                    "teamPosition": ROLE_KEYS[i % 5], "championName": rng.choice(CHAMPS),
+                    "kills": k, "deaths": d, "assists": a,
+                    "summoner1Id": 4, "summoner2Id": rng.choice([7, 12, 14]),
+                })
+            world.add_match({
+                "metadata": {"matchId": mid, "participants": players},
+                "info": {"gameVersion": f"{patch}.{500 + m % 7}.1", "queueId": 420, "participants": parts,
+                         "teams": [{"teamId": 100, "win": blue_win}, {"teamId": 200, "win": not blue_win}]},
+            })
+        return world
+
+    @classmethod
+    def from_jsonl(cls, path: Path) -> "MockWorld":
+        """Rejoue un matches_raw.jsonl (puuid inventés si absents, ex: données démo)."""
+        world = cls()
+        with path.open("r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    m = json.loads(line)
+                except Exception:
+                    continue
+                mid = m.get("metadata", {}).get("matchId")
+                parts = m.get("info", {}).get("participants", [])
+                if not mid or not parts: continue
+                for i, p in enumerate(parts):
+                    p.setdefault("puuid", f"PUUID-{mid}-{i}")
+                world.add_match(m)
+        return world
+
+
+# ===============================
+#   RATE LIMIT / PANNES / STATS
+# ===============================
+class AppRateLimiter:
+    """Fenêtres glissantes par clé (X-Riot-Token), comme l'app rate limit Riot."""
+
+    def __init__(self, limits: List[Tuple[int, float]]):
+        self.limits = limits
+        self.hits: Dict[str, Deque[float]] = collections.defaultdict(collections.deque)
+        self.lock = threading.Lock()
+
+    def hit(self, key: str) -> Tuple[float | None, str]:
+        """Retourne (retry_after ou None, en-tête X-App-Rate-Limit-Count)."""
+        now = time.monotonic()
+        with self.lock:
+            q = self.hits[key]
+            horizon = max((w for _, w in self.limits), default=0)
+            while q and now - q[0] > horizon: q.popleft()
+            counts = [sum(1 for t in q if now - t <= w) for _, w in self.limits]
+            for (n, w), c in zip(self.limits, counts):
+                if c >= n:
+                    oldest = next(t for t in q if now - t <= w)
+                    header = ",".join(f"{c}:{int(w)}" for c, (_, w) in zip(counts, self.limits))
+                    return max(1.0, w - (now - oldest)), header
+            q.append(now)
+            header = ",".join(f"{c + 1}:{int(w)}" for c, (_, w) in zip(counts, self.limits))
+            return None, header
+
+class MockStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        self.calls: collections.Counter = collections.Counter()    # (endpoint, status)
+        self.match_served: collections.Counter = collections.Counter()  # matchId -> nb de 200
+
+    def record(self, endpoint: str, status: int, match_id: str | None = None) -> None:
+        with self.lock:
+            self.calls[(endpoint, status)] += 1
+            if match_id and status == 200: self.match_served[match_id] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            total = sum(self.calls.values())
+            by_status = collections.Counter()
+            by_endpoint = collections.Counter()
+            for (ep, st), n in self.calls.items():
+                by_status[st] += n; by_endpoint[ep] += n
+            distinct = len(self.match_served)
+            dup = sum(n - 1 for n in self.match_served.values())
+            return {"total_calls": total, "by_status": dict(by_status), "by_endpoint": dict(by_endpoint),
+                    "matches_served": distinct, "duplicate_match_fetches": dup}
+
+
+# ===============================
+#            SERVEUR
+# ===============================
+ROUTES = [
+    ("league.master",      re.compile(r"^/lol/league/v4/masterleagues/by-queue/([^/]+)$")),
+    ("league.grandmaster", re.compile(r"^/lol/league/v4/grandmasterleagues/by-queue/([^/]+)$")),
+    ("league.challenger",  re.compile(r"^/lol/league/v4/challengerleagues/by-queue/([^/]+)$")),
+    ("league.entries",     re.compile(r"^/lol/league/v4/entries/([^/]+)/([^/]+)/([^/]+)$")),
+    ("summoner.by_puuid",  re.compile(r"^/lol/summoner/v4/summoners/by-puuid/([^/]+)$")),
+    ("summoner.by_name",   re.compile(r"^/lol/summoner/v4/summoners/by-name/([^/]+)$")),
+    ("summoner.by_id",     re.compile(r"^/lol/summoner/v4/summoners/([^/]+)$")),
+    ("account.by_riot_id", re.compile(r"^/riot/account/v1/accounts/by-riot-id/([^/]+)/([^/]+)$")),
+    ("match.ids",          re.compile(r"^/lol/match/v5/matches/by-puuid/([^/]+)/ids$")),
+    ("match.by_id",        re.compile(r"^/lol/match/v5/matches/([^/]+)$")),
+]
+
+class MockConfig:
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, p429: float = 0.0, p5xx: float = 0.0,
+                 rate_limit: str = "20:1,100:120", seed: int = 0, revoked: Set[str] | None = None):
+        self.latency_ms = latency_ms; self.jitter_ms = jitter_ms
+        self.p429 = p429; self.p5xx = p5xx
+        self.rate_limit = rate_limit
+        self.revoked = set(revoked or ())   # clés qui répondent 403
+        self.rng = random.Random(seed); self.rng_lock = threading.Lock()
+
+    def roll(self) -> float:
+        with self.rng_lock:
+            return self.rng.random()
+
+class MockRiotServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, addr: Tuple[str, int], world: MockWorld, config: MockConfig):
+        super().__init__(addr, MockHandler)
+        self.world = world; self.config = config
+        self.limiter = AppRateLimiter(parse_limits(config.rate_limit))
+        self.stats = MockStats()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+class MockHandler(BaseHTTPRequestHandler):
+    server: MockRiotServer
+
+    def log_message(self, *args) -> None:  # silencieux
+        pass
+
+    def send_json(self, status: int, body: Any, headers: Dict[str, str] | None = None) -> None:
+        data = body if isinstance(body, bytes) else json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json;charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items(): self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        if url.path == "/__stats":
+            return self.send_json(200, self.server.stats.snapshot())
+
+        # /{platform}/lol/... : le préfixe vient de riot_keys.riot_base_url()
+        path = re.sub(r"^/[a-z0-9]+(?=/(lol|riot)/)", "", url.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        endpoint, args = "unknown", ()
+        for name, rx in ROUTES:
+            m = rx.match(path)
+            if m:
+                endpoint, args = name, tuple(unquote(a) for a in m.groups()); break
+
+        cfg = self.server.config
+        if cfg.latency_ms or cfg.jitter_ms:
+            time.sleep(max(0.0, cfg.latency_ms + cfg.jitter_ms * (2 * cfg.roll() - 1)) / 1000.0)
+
+        token = self.headers.get("X-Riot-Token", "")
+        if token in cfg.revoked:
+            self.server.stats.record(endpoint, 403)
+            return self.send_json(403, {"status": {"message": "Forbidden", "status_code": 403}})
+
+        retry_after, count = self.server.limiter.hit(token)
+        rl_headers = {"X-App-Rate-Limit": cfg.rate_limit, "X-App-Rate-Limit-Count": count}
+        if retry_after is not None:
+            self.server.stats.record(endpoint, 429)
+            return self.send_json(429, {"status": {"message": "Rate limit exceeded", "status_code": 429}},
+                                  {**rl_headers, "Retry-After": str(int(retry_after + 0.999)),
+                                   "X-Rate-Limit-Type": "application"})
+        roll = cfg.roll()
+        if roll < cfg.p429:
+            self.server.stats.record(endpoint, 429)
+            return self.send_json(429, {"status": {"message": "Rate limit exceeded", "status_code": 429}},
+                                  {**rl_headers, "Retry-After": "1", "X-Rate-Limit-Type": "service"})
+        if roll < cfg.p429 + cfg.p5xx:
+            status = 503 if roll < cfg.p429 + cfg.p5xx / 2 else 500
+            self.server.stats.record(endpoint, status)
+            return self.send_json(status, {"status": {"message": "Injected error", "status_code": status}}, rl_headers)
+
+        status, body = self.route(endpoint, args, query)
+        self.server.stats.record(endpoint, status, args[0] if endpoint == "match.by_id" else None)
+        self.send_json(status, body, rl_headers)
+
+    def route(self, endpoint: str, args: Tuple[str, ...], query: Dict[str, str]) -> Tuple[int, Any]:
+        w = self.server.world
+        not_found = (404, {"status": {"message": "Data not found", "status_code": 404}})
+
+        if endpoint in ("league.master", "league.grandmaster", "league.challenger"):
+            tier = endpoint.split(".")[1].upper()
+            entries = [{"summonerId": p["id"], "puuid": p["puuid"], "leaguePoints": 100, "wins": 10, "losses": 10}
+                       for p in w.tier(tier)]
+            return 200, {"tier": tier, "queue": args[0], "entries": entries}
+        if endpoint == "league.entries":
+            page = int(query.get("page", 1)); size = 205
+            chunk = w.players[300 + (page - 1) * size: 300 + page * size]
+            return 200, [{"summonerId": p["id"], "puuid": p["puuid"], "tier": args[1], "rank": args[2]} for p in chunk]
+        if endpoint in ("summoner.by_id", "summoner.by_puuid", "summoner.by_name"):
+            if endpoint == "summoner.by_id": p = w.by_summoner.get(args[0])
+            elif endpoint == "summoner.by_puuid": p = w.by_puuid.get(args[0])
+            else: p = next((x for x in w.players if x["gameName"].lower() == args[0].lower()), None)
+            if not p: return not_found
+            return 200, {"id": p["id"], "puuid": p["puuid"], "name": p["gameName"], "summonerLevel": 100}
+        if endpoint == "account.by_riot_id":
+            p = w.by_riot_id.get((args[0].lower(), args[1].lower()))
+            if not p: return not_found
+            return 200, {"puuid": p["puuid"], "gameName": p["gameName"], "tagLine": p["tagLine"]}
+        if endpoint == "match.ids":
+            ids = w.matchlists.get(args[0], [])
+            if "queue" in query: ids = [m for m in ids if w.match_queue.get(m) == int(query["queue"])]
+            start = int(query.get("start", 0)); count = min(int(query.get("count", 20)), 100)
+            return 200, ids[start:start + count]
+        if endpoint == "match.by_id":
+            body = w.matches.get(args[0])
+            return (200, body) if body is not None else not_found
+        return not_found
+
+
+def start_server(world: MockWorld, config: MockConfig, host: str = "127.0.0.1", port: int = 0) -> MockRiotServer:
+    """Démarre le serveur dans un thread (port=0 : port libre)."""
+    server = MockRiotServer((host, port), world, config)
+    threading.Thread(target=server.serve_forever, name="riot-mock", daemon=True).start()
+    return server
+
+
+# ===============================
+#        TEST DE CHARGE
+# ===============================
+def run_loadtest(server: MockRiotServer, crawler: str, target: int, sleep_per_call: float,
+                 keys: int = 1) -> Dict[str, Any]:
+    """
+    Lance le vrai crawler contre le serveur et mesure le débit (`keys` clés dans le pool).
+    sleep_per_call ne concerne que --crawler riot : collect est cadencé par le budget des clés.
+    Les chemins de sortie de lol_matchups_test sont redirigés vers un dossier temporaire, puis restaurés.
+    """
+    api_keys = [f"RGAPI-MOCK-{i}" for i in range(1, keys + 1)]
+    workdir = Path(tempfile.mkdtemp(prefix="riot_loadtest_"))
+    server.stats.reset()
+    t0 = time.perf_counter()
+    if crawler == "collect":
+        import data_base_riot
+        data_base_riot.collect_dataset(
+            api_key="RGAPI-MOCK", region="europe", platform="euw1", target_matches=target, queue_id=420,
+            outdir=workdir, base_url=server.base_url, api_keys=api_keys, key_limits=server.config.rate_limit,
+        )
+    else:
+        import lol_matchups_test
+        saved = (lol_matchups_test.DATA_DIR, lol_matchups_test.RAW_PATH)
+        lol_matchups_test.DATA_DIR = workdir
+        lol_matchups_test.RAW_PATH = workdir / "matches_raw.jsonl"
+        p = server.world.players[0]
+        try:
+            lol_matchups_test.riot_collect(
+                api_key="RGAPI-MOCK", platform="euw1", region="europe", game_name=p["gameName"], tag_line=p["tagLine"],
+                count=min(target, 100), pause_sec=sleep_per_call, base_url=server.base_url,
+                api_keys=api_keys, key_limits=server.config.rate_limit,
+            )
+        finally:
+            lol_matchups_test.DATA_DIR, lol_matchups_test.RAW_PATH = saved
+    elapsed = time.perf_counter() - t0
+    snap = server.stats.snapshot()
+    total = snap["total_calls"]
+    ok = snap["by_status"].get(200, 0)
+    matches = snap["matches_served"]
+    wasted = (total - ok) + snap["duplicate_match_fetches"]
+    return {"elapsed_s": elapsed, "matches": matches, "matches_per_s": matches / elapsed if elapsed else 0.0,
+            "calls_per_match": total / matches if matches else float("inf"),
+            "wasted_calls": wasted, "wasted_pct": 100.0 * wasted / total if total else 0.0,
+            "outdir": str(workdir), **snap}
+
+def print_report(r: Dict[str, Any]) -> None:
+    print("\n========== LOAD TEST ==========")
+    print(f"durée            : {r['elapsed_s']:.2f} s")
+    print(f"matchs obtenus   : {r['matches']}  ({r['matches_per_s']:.2f} matchs/s)")
+    print(f"appels API       : {r['total_calls']}  ({r['calls_per_match']:.2f} appels/match)")
+    print(f"budget gaspillé  : {r['wasted_calls']} appels ({r['wasted_pct']:.1f} %) "
+          f"= non-200 + {r['duplicate_match_fetches']} matchs re-téléchargés")
+    print("statuts          : " + ", ".join(f"{k}={v}" for k, v in sorted(r["by_status"].items())))
+    print("par endpoint     : " + ", ".join(f"{k}={v}" for k, v in sorted(r["by_endpoint"].items())))
+    print(f"sorties          : {r['outdir']}")
+
+
+# ===============================
+#               CLI
+# ===============================
+def main():
+    ap = argparse.ArgumentParser(description="Faux serveur Riot API + test de charge des crawlers")
+    ap.add_argument("--host", type=str, default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--fixtures", type=str, help="matches_raw.jsonl à rejouer (sinon données synthétiques)")
+    ap.add_argument("--players", type=int, default=2000, help="Joueurs synthétiques")
+    ap.add_argument("--matches", type=int, default=5000, help="Matchs synthétiques")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--latency-ms", type=float, default=0.0, help="Latence ajoutée à chaque réponse")
+    ap.add_argument("--jitter-ms", type=float, default=0.0, help="Variation +/- de la latence")
+    ap.add_argument("--rate-limit", type=str, default="20:1,100:120", help="Limites par clé 'n:secondes,...'")
+    ap.add_argument("--p429", type=float, default=0.0, help="Probabilité de 429 injecté (service)")
+    ap.add_argument("--p5xx", type=float, default=0.0, help="Probabilité de 500/503 injecté")
+    ap.add_argument("--revoke-keys", type=str, default="", help="Clés qui répondent 403, séparées par des virgules")
+
+    ap.add_argument("--loadtest", action="store_true", help="Lance le serveur + un crawler et affiche le bilan")
+    ap.add_argument("--crawler", choices=["collect", "riot"], default="collect",
+                    help="collect = data_base_riot.collect_dataset, riot = lol_matchups_test.riot_collect")
+    ap.add_argument("--target", type=int, default=200, help="Matchs visés par le crawler")
+    ap.add_argument("--sleep-per-call", type=float, default=0.0, help="Pause client entre appels de --crawler riot (1.2 en prod)")
+    ap.add_argument("--keys", type=int, default=1, help="Taille du pool de clés du crawler (RGAPI-MOCK-1..N)")
+    ap.add_argument("--json", action="store_true", help="Bilan en JSON")
+    args = ap.parse_args()
+
+    if args.fixtures:
+        world = MockWorld.from_jsonl(Path(args.fixtures))
+    else:
+        world = MockWorld.synthetic(args.players, args.matches, seed=args.seed)
+    config = MockConfig(args.latency_ms, args.jitter_ms, args.p429, args.p5xx, args.rate_limit, seed=args.seed,
+                        revoked={k.strip() for k in args.revoke_keys.split(",") if k.strip()})
+    print(f"[MOCK] {len(world.players)} joueurs, {len(world.matches)} matchs. "
+          f"Riot ID d'exemple: {world.players[0]['gameName']}#{world.players[0]['tagLine']}")
+
+    if args.loadtest:
+        server = start_server(world, config, args.host, 0)
+        report = run_loadtest(server, args.crawler, args.target, args.sleep_per_call, keys=args.keys)
+        server.shutdown()
+        if args.json:
+            print(json.dumps(report, indent=2, default=str))
+        else:
+            print_report(report)
+        return
+
+    server = MockRiotServer((args.host, args.port), world, config)
+    print(f"[MOCK] Écoute sur {server.base_url} (export RIOT_BASE_URL={server.base_url}). Ctrl+C pour arrêter.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
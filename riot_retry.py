@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Appels Riot résilients, partagés par les deux collecteurs.
+
+- backoff exponentiel avec jitter, paramétré par classe d'erreur (429, 5xx, réseau)
+- circuit breaker par endpoint : une tempête de 5xx sur match-v5 ne met en pause que match-v5
+- file de retry différée : un matchId en échec est retenté plus tard, sans bloquer le travail neuf
+- bilan des IDs définitivement perdus en fin de collecte
+
+Aucune dépendance à riotwatcher : les erreurs sont classées via e.response.status_code.
+"""
+
+from __future__ import annotations
+import heapq, itertools, random, threading, time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, List, Tuple
+
+
+# --------- Classes d'erreur ----------
+def status_of(exc: BaseException) -> int | None:
+    return getattr(getattr(exc, "response", None), "status_code", None)
+
+def classify(exc: BaseException) -> str:
+    """rate_limit | server | network | auth | client"""
+    code = status_of(exc)
+    if code == 429: return "rate_limit"
+    if code in (401, 403): return "auth"
+    if code is not None and code >= 500: return "server"
+    if code is not None: return "client"          # 400/404/...: inutile de réessayer
+    if isinstance(exc, OSError): return "network"  # requests.ConnectionError/Timeout héritent d'OSError
+    return "client"
+
+def retry_after(exc: BaseException) -> float | None:
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass
+class BackoffPolicy:
+    base: float          # délai de la 1re tentative
+    cap: float           # délai max
+    max_attempts: int    # tentatives immédiates avant de rendre la main (différer)
+
+    def delay(self, attempt: int) -> float:
+        """Full jitter : uniforme dans [0, min(cap, base * 2**attempt)]."""
+        return random.uniform(0, min(self.cap, self.base * (2 ** attempt)))
+
+POLICIES: Dict[str, BackoffPolicy] = {
+    "rate_limit": BackoffPolicy(base=2.0, cap=60.0, max_attempts=8),
+    "server":     BackoffPolicy(base=1.0, cap=30.0, max_attempts=3),
+    "network":    BackoffPolicy(base=1.0, cap=30.0, max_attempts=3),
+}
+
+
+# --------- Exceptions transitoires (l'appelant diffère l'ID) ----------
+class TransientError(Exception):
+    """Échec temporaire : l'appel peut être retenté plus tard."""
+    def __init__(self, endpoint: str, reason: str, retry_in: float = 0.0):
+        super().__init__(f"{endpoint}: {reason}")
+        self.endpoint = endpoint; self.reason = reason; self.retry_in = retry_in
+
+class CircuitOpen(TransientError):
+    pass
+
+class RetryExhausted(TransientError):
+    pass
+
+class Interrupted(TransientError):
+    """Attente (backoff, budget de clé) interrompue par une demande d'arrêt : l'appel n'a pas eu lieu."""
+    pass
+
+
+def stoppable_sleep(stop: threading.Event) -> Callable[[float], None]:
+    """sleep() pour RetryScheduler / KeyPool : se réveille dès que `stop` est levé (Annuler)."""
+    def sleep(seconds: float) -> None:
+        if stop.wait(seconds):
+            raise Interrupted("attente", "arrêt demandé")
+    return sleep
+
+
+# --------- Circuit breaker ----------
+class CircuitBreaker:
+    """
+    closed -> open après `threshold` échecs 5xx/réseau consécutifs ; open pendant `cooldown` s,
+    puis half-open : un seul appel d'essai, qui referme ou rouvre le circuit.
+    Partagé par les workers de téléchargement : tout l'état est protégé par un verrou.
+    """
+    def __init__(self, threshold: int = 5, cooldown: float = 30.0):
+        self.threshold = threshold; self.cooldown = cooldown
+        self.failures = 0; self.opened_at: float | None = None; self.trips = 0
+        self.trial = False   # appel d'essai half-open en cours
+        self.lock = threading.Lock()
+
+    def allow(self, now: float) -> bool:
+        with self.lock:
+            if self.opened_at is None: return True
+            if self.trial or now - self.opened_at < self.cooldown: return False
+            self.trial = True   # half-open : ce thread fait l'appel d'essai, les autres attendent son issue
+            return True
+
+    def retry_in(self, now: float) -> float:
+        with self.lock:
+            return 0.0 if self.opened_at is None else max(0.0, self.opened_at + self.cooldown - now)
+
+    def record_success(self) -> None:
+        with self.lock:
+            self.failures = 0; self.opened_at = None; self.trial = False
+
+    def record_failure(self, now: float) -> bool:
+        """Retourne True si le circuit (ré)ouvre."""
+        with self.lock:
+            self.failures += 1; self.trial = False
+            if self.opened_at is not None or self.failures >= self.threshold:
+                self.opened_at = now; self.trips += 1
+                return True
+            return False
+
+    def release(self) -> None:
+        """L'appel d'essai n'a rien appris (429, arrêt demandé) : un autre pourra le refaire."""
+        with self.lock:
+            self.trial = False
+
+
+def endpoint_name(fn: Callable) -> str:
+    """lol.match.by_id -> 'MatchApiV5.by_id'"""
+    owner = getattr(fn, "__self__", None)
+    name = getattr(fn, "__name__", repr(fn))
+    return f"{type(owner).__name__}.{name}" if owner is not None else name
+
+
+# --------- Planificateur ----------
+class RetryScheduler:
+    def __init__(self, policies: Dict[str, BackoffPolicy] | None = None,
+                 breaker_threshold: int = 5, breaker_cooldown: float = 30.0,
+                 sleep: Callable[[float], None] = time.sleep, clock: Callable[[], float] = time.monotonic):
+        self.policies = policies or POLICIES
+        self.breaker_threshold = breaker_threshold; self.breaker_cooldown = breaker_cooldown
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.sleep = sleep; self.clock = clock
+        self.stats: Dict[str, int] = {"calls": 0, "retries": 0, "rate_limited": 0, "server": 0, "network": 0}
+        self.lock = threading.Lock()   # partagé par les workers de téléchargement
+
+    def breaker(self, endpoint: str) -> CircuitBreaker:
+        with self.lock:
+            if endpoint not in self.breakers:
+                self.breakers[endpoint] = CircuitBreaker(self.breaker_threshold, self.breaker_cooldown)
+            return self.breakers[endpoint]
+
+    def count(self, name: str) -> None:
+        with self.lock:
+            self.stats[name] += 1
+
+    def call(self, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Appelle fn avec retries. Lève :
+          - CircuitOpen / RetryExhausted (TransientError) : à différer
+          - SystemExit sur 401/403 (clé invalide)
+          - l'exception d'origine pour les erreurs client (404…)
+        """
+        endpoint = endpoint_name(fn)
+        br = self.breaker(endpoint)
+        attempt = {k: 0 for k in self.policies}
+        while True:
+            now = self.clock()
+            if not br.allow(now):
+                raise CircuitOpen(endpoint, "circuit ouvert", br.retry_in(now))
+            self.count("calls")
+            try:
+                res = fn(*args, **kwargs)
+            except Interrupted:
+                br.release(); raise
+            except Exception as e:
+                cls = classify(e)
+                if cls == "auth":
+                    raise SystemExit("Clé API invalide/expirée (401/403). Mets RIOT_API_KEY à jour.")
+                if cls == "client":
+                    br.record_success()   # l'endpoint répond, c'est la requête qui est invalide
+                    raise
+                self.count(cls if cls != "rate_limit" else "rate_limited")
+                if cls == "rate_limit": br.release()
+                policy = self.policies[cls]
+                if cls != "rate_limit" and br.record_failure(self.clock()):
+                    raise CircuitOpen(endpoint, f"circuit ouvert ({cls})", br.retry_in(self.clock()))
+                if attempt[cls] >= policy.max_attempts:
+                    raise RetryExhausted(endpoint, f"{cls} x{attempt[cls]}", policy.delay(attempt[cls]))
+                wait = retry_after(e) if cls == "rate_limit" else None
+                self.sleep(wait if wait is not None else policy.delay(attempt[cls]))
+                attempt[cls] += 1; self.count("retries")
+                continue
+            br.record_success()
+            return res
+
+
+# --------- File de retry différée ----------
+class DeferredRetryQueue:
+    """
+    Tas (prêt_à, seq, clé). Une clé différée plus de `max_attempts` fois est
+    considérée comme définitivement perdue et comptée dans `failed`.
+    """
+    def __init__(self, max_attempts: int = 5, base_delay: float = 10.0, cap: float = 300.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_attempts = max_attempts; self.base_delay = base_delay; self.cap = cap; self.clock = clock
+        self.heap: List[Tuple[float, int, Hashable]] = []
+        self.attempts: Dict[Hashable, int] = {}
+        self.failed: Dict[Hashable, str] = {}
+        self.recovered = 0
+        self.seq = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self.heap)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.attempts
+
+    def defer(self, key: Hashable, err: BaseException) -> bool:
+        """Programme un nouvel essai ; False si la clé est abandonnée."""
+        n = self.attempts.get(key, 0) + 1
+        if n > self.max_attempts:
+            self.fail(key, err); return False
+        self.attempts[key] = n
+        delay = max(getattr(err, "retry_in", 0.0), random.uniform(0, min(self.cap, self.base_delay * 2 ** (n - 1))))
+        heapq.heappush(self.heap, (self.clock() + delay, next(self.seq), key))
+        return True
+
+    def fail(self, key: Hashable, err: BaseException) -> None:
+        self.attempts.pop(key, None)
+        self.failed[key] = str(err)
+
+    def done(self, key: Hashable) -> None:
+        if self.attempts.pop(key, None) is not None:
+            self.recovered += 1
+
+    def pop_ready(self) -> List[Hashable]:
+        now = self.clock(); out = []
+        while self.heap and self.heap[0][0] <= now:
+            out.append(heapq.heappop(self.heap)[2])
+        return out
+
+    def next_ready_in(self) -> float | None:
+        return None if not self.heap else max(0.0, self.heap[0][0] - self.clock())
+
+    def summary(self) -> str:
+        kinds: Dict[str, int] = {}
+        for key in self.failed:
+            kind = key[0] if isinstance(key, tuple) else "id"
+            kinds[kind] = kinds.get(kind, 0) + 1
+        detail = ", ".join(f"{k}={v}" for k, v in sorted(kinds.items())) or "aucun"
+        return (f"récupérés après retry: {self.recovered}, définitivement perdus: {len(self.failed)} ({detail}), "
+                f"encore en attente: {len(self.heap)}")
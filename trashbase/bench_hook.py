@@ -0,0 +1,94 @@
+"""
+键盘钩子回调延迟测试：用假的按键事件和假的输出后端，在任何平台上运行。
+
+    python bench_hook.py --presses 200 --interval 0.005
+
+对比两种方式：
+  - blocking  ：旧做法，回调里直接 send_text_to_game
+  - dispatcher：回调只入队，由 Dispatcher 线程发送
+"""
+
+import argparse
+import statistics
+import time
+
+import main
+
+
+class FakeKey:
+    def __init__(self, char):
+        self.char = char
+
+
+class SleepingBackend(main.RecordingBackend):
+    """记录事件，同时真的 sleep，模拟游戏里的发送耗时。"""
+
+    def sleep(self, seconds):
+        super().sleep(seconds)
+        time.sleep(seconds)
+
+
+def key_sequence(n):
+    """连发同一个键 + 交替不同的键，覆盖合并和排队两种情况。"""
+    pattern = ["+", "+", "+", "-", "*", "/", "-", "-"]
+    return [FakeKey(pattern[i % len(pattern)]) for i in range(n)]
+
+
+def measure(on_press, keys, interval):
+    latencies = []
+    for key in keys:
+        t0 = time.perf_counter()
+        on_press(key)
+        latencies.append(time.perf_counter() - t0)
+        time.sleep(interval)
+    return latencies
+
+
+def blocking_on_press(backend):
+    def on_press(key):
+        main.send_text_to_game(main.pick_message(key.char), backend)
+
+    return on_press
+
+
+def report(name, latencies, wall):
+    ms = sorted(x * 1000 for x in latencies)
+    p99 = ms[min(len(ms) - 1, int(0.99 * len(ms)))]
+    print(
+        f"{name:<11} n={len(ms):<5} mean={statistics.mean(ms):8.3f} ms  "
+        f"p99={p99:8.3f} ms  max={ms[-1]:8.3f} ms  wall={wall:6.2f} s"
+    )
+
+
+def main_bench():
+    ap = argparse.ArgumentParser(description="键盘钩子回调延迟测试")
+    ap.add_argument("--presses", type=int, default=200, help="假按键数量")
+    ap.add_argument("--interval", type=float, default=0.005, help="两次按键间隔（秒）")
+    ap.add_argument("--blocking-presses", type=int, default=5, help="旧做法只测几次（每次约 0.5 秒）")
+    args = ap.parse_args()
+
+    # 旧做法：每次回调都要等整条消息发完
+    backend = SleepingBackend()
+    keys = key_sequence(args.blocking_presses)
+    t0 = time.perf_counter()
+    lat = measure(blocking_on_press(backend), keys, args.interval)
+    report("blocking", lat, time.perf_counter() - t0)
+
+    # 新做法：回调只入队
+    backend = SleepingBackend()
+    dispatcher = main.Dispatcher(backend=backend, clipboard=None)
+    dispatcher.start()
+    keys = key_sequence(args.presses)
+    t0 = time.perf_counter()
+    lat = measure(main.make_on_press(dispatcher), keys, args.interval)
+    report("dispatcher", lat, time.perf_counter() - t0)
+    dispatcher.stop()
+
+    print(
+        f"dispatcher: 已发送 {dispatcher.sent} 条，合并/丢弃 {dispatcher.dropped} 次，"
+        f"SendInput 调用 {len(backend.calls)} 次"
+    )
+
+
+if __name__ == "__main__":
+    main_bench()
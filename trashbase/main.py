@@ -1,17 +1,28 @@
+import abc
 import ctypes
 import time
 import random
 import threading
-from pynput import keyboard
+import queue
 import pyperclip
 import os
 
-# Windows API 定义
-SendInput = ctypes.windll.user32.SendInput
+try:
+    from pynput import keyboard
+except Exception:  # 无图形环境（例如 Linux CI）时仍可使用输入后端
+    keyboard = None
 
 # 输入事件结构体
 PUL = ctypes.POINTER(ctypes.c_ulong)
 
+INPUT_KEYBOARD = 1
+KEYEVENTF_KEYUP = 0x0002
+KEYEVENTF_UNICODE = 0x0004
+VK_RETURN = 0x0D
+
+CHUNK_EVENTS = 64  # 每次 SendInput 的事件数（32 个字符），游戏聊天框一次吃得下
+CHUNK_PAUSE = 0.005  # 两次 SendInput 之间的间隔
+
 
 class KeyBdInput(ctypes.Structure):
     _fields_ = [
@@ -50,42 +61,153 @@ class Input(ctypes.Structure):
     _fields_ = [("type", ctypes.c_ulong), ("ii", Input_I)]
 
 
-def press_enter():
-    ctypes.windll.user32.keybd_event(0x0D, 0, 0, 0)  # Enter down
-    ctypes.windll.user32.keybd_event(0x0D, 0, 2, 0)  # Enter up
+# ================= 编码：文本 -> INPUT 数组 ==================
+
+
+def encode_text(text):
+    """
+    把整条消息预先编码成一个 INPUT 数组。
+    每个 UTF-16 码元一次按下 + 一次抬起；BMP 以外的字符（emoji 等）
+    拆成代理对的两个码元，由目标窗口的 WM_CHAR 重新组合。
+    """
+    data = text.encode("utf-16-le")
+    units = [int.from_bytes(data[i : i + 2], "little") for i in range(0, len(data), 2)]
+    inputs = (Input * (2 * len(units)))()
+    for i, unit in enumerate(units):
+        for j, flags in enumerate((KEYEVENTF_UNICODE, KEYEVENTF_UNICODE | KEYEVENTF_KEYUP)):
+            item = inputs[2 * i + j]
+            item.type = INPUT_KEYBOARD
+            item.ii.ki.wScan = unit
+            item.ii.ki.dwFlags = flags
+    return inputs
+
+
+def encode_enter():
+    """回车键按下 + 抬起。"""
+    inputs = (Input * 2)()
+    for item, flags in zip(inputs, (0, KEYEVENTF_KEYUP)):
+        item.type = INPUT_KEYBOARD
+        item.ii.ki.wVk = VK_RETURN
+        item.ii.ki.dwFlags = flags
+    return inputs
+
+
+ENTER_INPUTS = encode_enter()
+
+
+# ================= 输入后端 ==================
+
+
+class InputBackend(abc.ABC):
+    """输入后端：把 INPUT 数组的一段交给系统。缺少 send 的子类在实例化时就会报错。"""
+
+    @abc.abstractmethod
+    def send(self, inputs, start, count):
+        """发送 inputs[start:start+count]，返回实际注入的事件数。"""
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+
+class Win32Backend(InputBackend):
+    """真实后端：user32.SendInput，一次调用发送一整段数组。"""
+
+    def __init__(self):
+        self.send_input = ctypes.windll.user32.SendInput
+        self.send_input.argtypes = (ctypes.c_uint, ctypes.c_void_p, ctypes.c_int)
+        self.send_input.restype = ctypes.c_uint
+
+    def send(self, inputs, start, count):
+        size = ctypes.sizeof(Input)
+        return self.send_input(count, ctypes.byref(inputs, start * size), size)
 
 
-def send_unicode_char(char):
-    """发送单个Unicode字符"""
-    uni_input = Input(type=1, ii=Input_I())
-    uni_input.ii.ki = KeyBdInput(
-        0, ord(char), 0x0004, 0, ctypes.pointer(ctypes.c_ulong(0))
-    )  # KEYEVENTF_UNICODE = 0x0004
-    SendInput(1, ctypes.pointer(uni_input), ctypes.sizeof(uni_input))
+class RecordingBackend(InputBackend):
+    """
+    测试用后端：不调用 Windows API，只记录每次 SendInput 的事件，
+    sleep 只累加虚拟时间，方便在 Linux 上检查内容和耗时。
+    """
 
-    uni_input.ii.ki.dwFlags = 0x0006  # KEYEVENTF_UNICODE | KEYEVENTF_KEYUP
-    SendInput(1, ctypes.pointer(uni_input), ctypes.sizeof(uni_input))
+    def __init__(self):
+        self.calls = []  # 每次 send 的 (虚拟时间, 事件数)
+        self.events = []  # (wVk, wScan, dwFlags)
+        self.elapsed = 0.0
 
+    def send(self, inputs, start, count):
+        self.calls.append((self.elapsed, count))
+        for item in inputs[start : start + count]:
+            ki = item.ii.ki
+            self.events.append((ki.wVk, ki.wScan, ki.dwFlags))
+        return count
 
-def send_text_to_game(text):
-    """直接在游戏中输入任意语言字符"""
-    time.sleep(0.3)
-    press_enter()  # 打开聊天框
-    time.sleep(0.1)
+    def sleep(self, seconds):
+        self.elapsed += seconds
 
-    for ch in text:
-        send_unicode_char(ch)
-        time.sleep(0.003)  # 防止太快
+    def text(self):
+        """还原收到的 Unicode 文本（只看按下事件）。"""
+        units = [scan for vk, scan, flags in self.events if flags == KEYEVENTF_UNICODE]
+        data = b"".join(u.to_bytes(2, "little") for u in units)
+        return data.decode("utf-16-le", errors="replace")
 
-    time.sleep(0.1)
-    press_enter()  # 发送消息
+
+def default_backend():
+    if hasattr(ctypes, "windll"):
+        return Win32Backend()
+    print("非 Windows 环境：使用 RecordingBackend，不会真正发送按键。")
+    return RecordingBackend()
+
+
+BACKEND = default_backend()
+
+
+def send_inputs(inputs, backend=None, chunk=CHUNK_EVENTS):
+    """分块调用 SendInput，每块之间稍作停顿。"""
+    backend = backend or BACKEND
+    total = len(inputs)
+    for start in range(0, total, chunk):
+        if start:
+            backend.sleep(CHUNK_PAUSE)
+        count = min(chunk, total - start)
+        sent = backend.send(inputs, start, count)
+        if sent != count:
+            raise OSError(f"SendInput 只注入了 {sent}/{count} 个事件（被其他程序拦截？）")
+
+
+def press_enter(backend=None):
+    send_inputs(ENTER_INPUTS, backend)
+
+
+def send_text_to_game(text, backend=None, inputs=None):
+    """直接在游戏中输入任意语言字符（inputs 可传入预先编码好的数组）"""
+    backend = backend or BACKEND
+    if inputs is None:
+        inputs = encode_text(text)
+
+    backend.sleep(0.3)
+    press_enter(backend)  # 打开聊天框
+    backend.sleep(0.1)
+
+    send_inputs(inputs, backend)
+
+    backend.sleep(0.1)
+    press_enter(backend)  # 发送消息
     print(f"[{time.strftime('%H:%M:%S')}] 已发送：{text}")
 
 
 # ================= 主监听逻辑 ==================
 
 TAUNTS_FILE = "taunts.txt"
-DEBOUNCE_SEC = 0.15
+QUEUE_SIZE = 8  # 最多积压 8 条待发消息，多余的按键直接丢弃
+
+MESSAGE_CACHE = {}  # 文本 -> 预编码的 INPUT 数组
+
+
+def cache_messages(messages):
+    """预先编码消息，发送时不再做任何编码工作。"""
+    for msg in messages:
+        if msg not in MESSAGE_CACHE:
+            MESSAGE_CACHE[msg] = encode_text(msg)
+    return messages
 
 
 def load_taunts(path=TAUNTS_FILE):
@@ -93,55 +215,110 @@ def load_taunts(path=TAUNTS_FILE):
         with open(path, encoding="utf-8") as f:
             lines = [ln.strip() for ln in f if ln.strip()]
         if lines:
-            return lines
-    return ["这是默认语句，替换 taunts.txt 以改变内容。"]
+            return cache_messages(lines)
+    return cache_messages(["这是默认语句，替换 taunts.txt 以改变内容。"])
 
 
 taunts = load_taunts()
-last_press_time = 0.0
-lock = threading.Lock()
 
 TEXT_MAP = {
     "+": "男的来了女的来了男同来了女同来了萝莉来了御姐来了男娘来了双性人来了跨性别来了性别酷儿来了流性人来了武装直升机来了沃尔玛购物袋来了自来水管来了小孩姐来了孙笑川来了嘉然来了多首的怪物来了户晨风来了PDD来了侯国玉来了虎哥来了刀哥来了唐老鸭来了小亮来了.",
     "*": "유럽 ​​대륙을 떠도는 유령, 바로 공산주의라는 유령입니다. 옛 유럽의 모든 세력이 이 유령을 몰아내기 위한 거룩한 투쟁에 힘을 합쳤습니다. 교황과 차르, 메테르니히와 기조, 프랑스 급진파와 독일 경찰 스파이까지 말입니다.",
     "/": "프롤레타리아트가 계급으로, 나아가 정당으로 조직되는 과정은 노동자들 사이의 경쟁으로 인해 끊임없이 약화됩니다. 그러나 이 조직은 끊임없이 재생산되며, 매번 더욱 강하고, 더욱 견고하고, 더욱 강력해집니다. 부르주아 내부의 분열을 이용하여 노동자들의 개인적 이익을 법적으로 인정하도록 강요합니다. 영국의 10시간 노동법안이 그 예입니다.",
 }
+cache_messages(TEXT_MAP.values())
 
 
-def on_press(key):
-    global last_press_time
-    now = time.time()
+def pick_message(char):
+    """按键 -> 要发送的文本。"""
+    if char == "-":
+        return random.choice(taunts)
+    return TEXT_MAP[char]
 
-    with lock:
-        if now - last_press_time < DEBOUNCE_SEC:
-            return
-        last_press_time = now
 
+def copy_to_clipboard(msg):
     try:
-        if hasattr(key, "char") and key.char == "-":
-            msg = random.choice(taunts)
-            pyperclip.copy(msg)
-            send_text_to_game(msg)
-            return
-
-        elif hasattr(key, "char") and key.char in TEXT_MAP:
-            msg = TEXT_MAP[key.char]
-            pyperclip.copy(msg)
-            send_text_to_game(msg)
+        pyperclip.copy(msg)
+    except pyperclip.PyperclipException as e:
+        print(f"剪贴板不可用：{e}")
+
+
+class Dispatcher(threading.Thread):
+    """
+    发送线程：键盘钩子回调只把按键放进有界队列，真正的发送（sleep + SendInput）在这里完成。
+    同一个按键还在队列里等待时，重复按下会被合并，不会重复发送。
+    """
+
+    def __init__(self, backend=None, maxsize=QUEUE_SIZE, clipboard=copy_to_clipboard):
+        super().__init__(name="taunt-dispatcher", daemon=True)
+        self.backend = backend
+        self.clipboard = clipboard
+        self.queue = queue.Queue(maxsize)
+        self.pending = set()  # 已入队但还没开始发送的按键
+        self.lock = threading.Lock()
+        self.sent = 0
+        self.dropped = 0
+
+    def submit(self, char):
+        """在钩子线程里调用：不阻塞，返回是否入队。"""
+        with self.lock:
+            if char in self.pending:
+                self.dropped += 1
+                return False
+            try:
+                self.queue.put_nowait(char)
+            except queue.Full:
+                self.dropped += 1
+                return False
+            self.pending.add(char)
+        return True
+
+    def run(self):
+        while True:
+            char = self.queue.get()
+            if char is None:
+                break
+            with self.lock:
+                self.pending.discard(char)
+            try:
+                msg = pick_message(char)
+                if self.clipboard:
+                    self.clipboard(msg)
+                send_text_to_game(msg, self.backend, MESSAGE_CACHE.get(msg))
+                self.sent += 1
+            except Exception as e:
+                # 任何异常都不能结束发送线程，否则队列塞满后所有按键都会被丢弃
+                print(f"发送失败（{type(e).__name__}）：{e}")
+            finally:
+                self.queue.task_done()
+
+    def stop(self):
+        """发完队列里已有的消息后退出。"""
+        self.queue.put(None)
+        self.join()
+
+
+def make_on_press(dispatcher):
+    def on_press(key):
+        char = getattr(key, "char", None)
+        if char == "-" or char in TEXT_MAP:
+            dispatcher.submit(char)
             return
 
-    except AttributeError:
-        pass
+        if keyboard is not None and key == keyboard.Key.esc:
+            print("检测到 Esc，程序退出。")
+            return False
 
-    if key == keyboard.Key.esc:
-        print("检测到 Esc，程序退出。")
-        return False
+    return on_press
 
 
 def main():
+    dispatcher = Dispatcher()
+    dispatcher.start()
     print("监听启动：按 '-' 或 '+/*//' 触发发送。按 Esc 退出。")
-    with keyboard.Listener(on_press=on_press) as listener:
+    with keyboard.Listener(on_press=make_on_press(dispatcher)) as listener:
         listener.join()
+    dispatcher.stop()
 
 
 if __name__ == "__main__":